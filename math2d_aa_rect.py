@@ -103,7 +103,13 @@ class AxisAlignedRectangle(object):
                 self.min_point.y = object.y
             if self.max_point.y < object.y:
                 self.max_point.y = object.y
-        elif isinstance(object, Polygon) or isinstance(object, Polyline):
+        elif isinstance(object, Polygon):
+            # The polygon caches its bounding box, so we need only grow for the corners of that.
+            if len(object.vertex_list) > 0:
+                bounding_box = object.BoundingBox()
+                self.GrowFor(bounding_box.min_point)
+                self.GrowFor(bounding_box.max_point)
+        elif isinstance(object, Polyline):
             for vertex in object.vertex_list:
                 self.GrowFor(vertex)
         elif isinstance(object, Region):
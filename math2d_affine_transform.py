@@ -40,24 +40,63 @@ class AffineTransform(object):
             return False
         return True if self.translation.IsZero(epsilon) else False
     
+    def Matrix(self):
+        # This is the upper 2x3 part of the homogeneous 3x3 matrix of the transform, row by row.
+        # The last row of that matrix is always (0, 0, 1), so we don't bother storing it.
+        x_axis = self.linear_transform.x_axis
+        y_axis = self.linear_transform.y_axis
+        return (x_axis.x, y_axis.x, self.translation.x, x_axis.y, y_axis.y, self.translation.y)
+
+    def FromMatrix(self, matrix):
+        self.linear_transform.x_axis = Vector(matrix[0], matrix[3])
+        self.linear_transform.y_axis = Vector(matrix[1], matrix[4])
+        self.translation = Vector(matrix[2], matrix[5])
+        return self
+
+    @staticmethod
+    def _ComposeMatrices(matrix_a, matrix_b):
+        # Return the matrix of the transform that applies B, then A.
+        a00, a01, a02, a10, a11, a12 = matrix_a
+        b00, b01, b02, b10, b11, b12 = matrix_b
+        return (
+            a00 * b00 + a01 * b10, a00 * b01 + a01 * b11, a00 * b02 + a01 * b12 + a02,
+            a10 * b00 + a11 * b10, a10 * b01 + a11 * b11, a10 * b02 + a11 * b12 + a12
+        )
+
+    @staticmethod
+    def Concatenate(transform_list):
+        # Collapse a chain of transforms into a single transform.  As with the * operator,
+        # the last transform in the list is the first one applied.
+        matrix = (1.0, 0.0, 0.0, 0.0, 1.0, 0.0)
+        for transform in transform_list:
+            matrix = AffineTransform._ComposeMatrices(matrix, transform.Matrix())
+        return AffineTransform().FromMatrix(matrix)
+
+    def TransformMany(self, point_list):
+        # Map a whole buffer of points in one pass.  Given a list of vectors, we return a new list of vectors.
+        # Given a VectorArray, we return a new VectorArray computed with a single vectorized expression.
+        m00, m01, m02, m10, m11, m12 = self.Matrix()
+        if isinstance(point_list, (list, tuple)):
+            return [Vector(m00 * point.x + m01 * point.y + m02, m10 * point.x + m11 * point.y + m12) for point in point_list]
+        from math2d_vector_array import VectorArray
+        return VectorArray(m00 * point_list.x + m01 * point_list.y + m02, m10 * point_list.x + m11 * point_list.y + m12)
+
     def Transform(self, object):
         from math2d_polygon import Polygon
         from math2d_region import Region, SubRegion
         from math2d_aa_rect import AxisAlignedRectangle
+        from math2d_planar_graph import PlanarGraph
         if isinstance(object, Vector):
-            return self.linear_transform.Transform(object) + self.translation
+            x_axis = self.linear_transform.x_axis
+            y_axis = self.linear_transform.y_axis
+            return Vector(x_axis.x * object.x + y_axis.x * object.y + self.translation.x, x_axis.y * object.x + y_axis.y * object.y + self.translation.y)
         elif isinstance(object, AffineTransform):
-            transform = AffineTransform()
-            transform.linear_transform.x_axis = self.linear_transform.Transform(object.linear_transform.x_axis)
-            transform.linear_transform.y_axis = self.linear_transform.Transform(object.linear_transform.y_axis)
-            transform.translation = self.Transform(object.translation)
-            return transform
+            return AffineTransform().FromMatrix(AffineTransform._ComposeMatrices(self.Matrix(), object.Matrix()))
         elif isinstance(object, LineSegment):
             return LineSegment(self.Transform(object.point_a), self.Transform(object.point_b))
         elif isinstance(object, Polygon):
             polygon = Polygon()
-            for vertex in object.vertex_list:
-                polygon.vertex_list.append(self.Transform(vertex))
+            polygon.vertex_list = self.TransformMany(object.vertex_list)
             return polygon
         elif isinstance(object, Region):
             region = Region()
@@ -70,6 +109,11 @@ class AffineTransform(object):
             for hole in object.hole_list:
                 sub_region.hole_list.append(self.Transform(hole))
             return sub_region
+        elif isinstance(object, PlanarGraph):
+            graph = PlanarGraph()
+            graph.vertex_list = self.TransformMany(object.vertex_list)
+            graph.edge_list = object.edge_list[:]
+            return graph
         elif isinstance(object, AxisAlignedRectangle):
             return AxisAlignedRectangle(min_point=self.Transform(object.min_point), max_point=self.Transform(object.max_point))
     
@@ -92,22 +136,14 @@ class AffineTransform(object):
         return inverse
     
     def Rotation(self, center, angle):
-        translation_a = AffineTransform(None, None, -center)
-        translation_b = AffineTransform(None, None, center)
-        rotation = AffineTransform()
-        rotation.linear_transform.Rotation(angle)
-        transform = translation_b * rotation * translation_a
-        self.linear_transform = transform.linear_transform
-        self.translation = transform.translation
+        # This is translate(center) * rotate(angle) * translate(-center), worked out in closed form.
+        self.linear_transform.Rotation(angle)
+        self.translation = center - self.linear_transform.Transform(center)
     
     def Reflection(self, center, vector):
-        translation_a = AffineTransform(None, None, -center)
-        translation_b = AffineTransform(None, None, center)
-        reflection = AffineTransform()
-        reflection.linear_transform.Reflection(vector)
-        transform = translation_b * reflection * translation_a
-        self.linear_transform = transform.linear_transform
-        self.translation = transform.translation
+        # This is translate(center) * reflect(vector) * translate(-center), worked out in closed form.
+        self.linear_transform.Reflection(vector)
+        self.translation = center - self.linear_transform.Transform(center)
     
     def Translation(self, translation):
         self.linear_transform.Identity()
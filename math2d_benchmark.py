@@ -0,0 +1,102 @@
+# math2d_benchmark.py
+
+import sys
+import math
+import time
+import tracemalloc
+
+from math2d_vector import Vector
+from math2d_polygon import Polygon
+
+class LegacyVector(object):
+    # This mirrors the original vector implementation (no slots, string-based hash,
+    # complex-number rotation) so that we have something to compare against.
+    def __init__(self, x=0.0, y=0.0):
+        self.x = x
+        self.y = y
+
+    def __add__(self, other):
+        return LegacyVector(self.x + other.x, self.y + other.y)
+
+    def __mul__(self, other):
+        return LegacyVector(self.x * other, self.y * other)
+
+    def __hash__(self):
+        return hash(str(self.x) + ',' + str(self.y))
+
+    def Rotated(self, angle):
+        result = complex(self.x, self.y) * complex(math.cos(angle), math.sin(angle))
+        return LegacyVector(result.real, result.imag)
+
+def MeasureBytesPerVertex(vector_class, count):
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        vertex_list = [vector_class(float(i), float(i)) for i in range(count)]
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    # The floats themselves are counted too, since that is what each vertex really costs.
+    return float(after - before) / float(len(vertex_list))
+
+def MeasureOpsPerSecond(func, vertex_list):
+    start = time.perf_counter()
+    func(vertex_list)
+    elapsed = time.perf_counter() - start
+    return float(len(vertex_list)) / elapsed if elapsed > 0.0 else float('inf')
+
+def Accumulate(vertex_list):
+    total = vertex_list[0].__class__(0.0, 0.0)
+    for vertex in vertex_list:
+        total += vertex
+    return total
+
+def Rotate(vertex_list):
+    return [vertex.Rotated(0.25) for vertex in vertex_list]
+
+def Hash(vertex_list):
+    return [hash(vertex) for vertex in vertex_list]
+
+def MakeWavyPolygon(count, lobes=200):
+    # Many lobes with a bit of noise gives us plenty of reflex vertices to deal with.
+    polygon = Polygon()
+    for i in range(count):
+        angle = 2.0 * math.pi * float(i) / float(count)
+        radius = 1.0 + 0.3 * math.sin(angle * float(lobes)) + 0.002 * math.sin(angle * 7919.0)
+        polygon.vertex_list.append(Vector(angle=angle, radius=radius))
+    return polygon
+
+def MakeStarPolygon(count):
+    # Alternating radii make every other vertex reflex and every ear long and thin, a worst case for us.
+    polygon = Polygon()
+    for i in range(count):
+        angle = 2.0 * math.pi * float(i) / float(count)
+        polygon.vertex_list.append(Vector(angle=angle, radius=1.0 if i % 2 == 0 else 0.5))
+    return polygon
+
+def RunTessellation(count_list):
+    for count in count_list:
+        for name, make_polygon in [('Wavy', MakeWavyPolygon), ('Star', MakeStarPolygon)]:
+            polygon = make_polygon(count)
+            start = time.perf_counter()
+            polygon.TessellateFast()
+            elapsed = time.perf_counter() - start
+            print('%s polygon of %d vertices: %d triangles in %.2f sec' % (name, count, len(polygon.mesh.triangle_list), elapsed))
+
+def Run(count):
+    print('Vertex count: %d' % count)
+    legacy_bytes = MeasureBytesPerVertex(LegacyVector, count)
+    bytes_per_vertex = MeasureBytesPerVertex(Vector, count)
+    print('Memory per vertex: %.1f bytes (was %.1f bytes)' % (bytes_per_vertex, legacy_bytes))
+    legacy_vertex_list = [LegacyVector(float(i), float(i)) for i in range(count)]
+    vertex_list = [Vector(float(i), float(i)) for i in range(count)]
+    for name, func in [('Accumulate', Accumulate), ('Rotate', Rotate), ('Hash', Hash)]:
+        legacy_rate = MeasureOpsPerSecond(func, legacy_vertex_list)
+        rate = MeasureOpsPerSecond(func, vertex_list)
+        print('%s: %.0f ops/sec (was %.0f ops/sec, %.2fx)' % (name, rate, legacy_rate, rate / legacy_rate))
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == 'tessellate':
+        RunTessellation([int(arg) for arg in sys.argv[2:]] or [10000, 30000, 100000])
+    else:
+        Run(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000)
@@ -0,0 +1,340 @@
+# math2d_bvh.py
+
+import numpy
+
+class BoundingVolumeHierarchy(object):
+    # This is a tree of bounding boxes over the triangles of a mesh, used to find which triangle, if any, contains a
+    # given point, or is first hit by a given ray, without testing every triangle.  It is built top-down, splitting the
+    # triangles of each node at the median of their centroids along the axis of greater spread, so the tree is
+    # balanced, and a query visits only those few nodes whose box contains the point.  Like the vertex index, it does
+    # not own the mesh, but is kept in sync with its vertex and triangle lists.  The tree is built lazily, and rebuilt
+    # whenever Sync() sees that either list was replaced, resized, or had its last item replaced.  Replacing some other
+    # item of either list in place goes unnoticed, so callers doing that must call Invalidate().  Nodes live in flat
+    # lists.  Each has a box, and either two children, or, if it is a leaf, a range of the triangle order list.
+    def __init__(self, leaf_size=8):
+        self.leaf_size = leaf_size
+        self.Invalidate()
+
+    def Invalidate(self):
+        self.key = None
+        self.node_count = 0
+
+    def Sync(self, vertex_list, triangle_list):
+        key = (
+            vertex_list, len(vertex_list), vertex_list[-1] if len(vertex_list) > 0 else None,
+            triangle_list, len(triangle_list), triangle_list[-1] if len(triangle_list) > 0 else None
+        )
+        if self.key is None or any([key[k] is not self.key[k] for k in (0, 2, 3, 5)]) or key[1] != self.key[1] or key[4] != self.key[4]:
+            self._Build(vertex_list, triangle_list)
+            self.key = key
+        return self
+
+    def _Build(self, vertex_list, triangle_list):
+        vertex_x = numpy.fromiter((vertex.x for vertex in vertex_list), dtype=numpy.float64, count=len(vertex_list))
+        vertex_y = numpy.fromiter((vertex.y for vertex in vertex_list), dtype=numpy.float64, count=len(vertex_list))
+        triple_array = numpy.array(triangle_list, dtype=numpy.int64).reshape(-1, 3)
+        ax = vertex_x[triple_array[:, 0]]
+        ay = vertex_y[triple_array[:, 0]]
+        bx = vertex_x[triple_array[:, 1]]
+        by = vertex_y[triple_array[:, 1]]
+        cx = vertex_x[triple_array[:, 2]]
+        cy = vertex_y[triple_array[:, 2]]
+
+        # Everything a containment test needs is kept per triangle, both as arrays for batch queries and as lists,
+        # which are faster to index one at a time, for single queries.
+        self.array_map = {
+            'ax': ax, 'ay': ay, 'bx': bx, 'by': by, 'cx': cx, 'cy': cy,
+            'min_x': numpy.minimum(numpy.minimum(ax, bx), cx),
+            'min_y': numpy.minimum(numpy.minimum(ay, by), cy),
+            'max_x': numpy.maximum(numpy.maximum(ax, bx), cx),
+            'max_y': numpy.maximum(numpy.maximum(ay, by), cy),
+            'length_ab': numpy.hypot(bx - ax, by - ay),
+            'length_bc': numpy.hypot(cx - bx, cy - by),
+            'length_ca': numpy.hypot(ax - cx, ay - cy),
+            'area': (bx - ax) * (cy - ay) - (by - ay) * (cx - ax)
+        }
+        self.list_map = {name: array.tolist() for name, array in self.array_map.items()}
+        self.triangle_count = len(triple_array)
+
+        self.min_x_list = []
+        self.min_y_list = []
+        self.max_x_list = []
+        self.max_y_list = []
+        self.left_list = []
+        self.right_list = []
+        self.start_list = []
+        self.count_list = []
+        order = numpy.arange(self.triangle_count)
+        if self.triangle_count > 0:
+            center_x = (ax + bx + cx) / 3.0
+            center_y = (ay + by + cy) / 3.0
+            self._AddNode()
+            stack = [(0, 0, self.triangle_count)]
+            while len(stack) > 0:
+                node, lo, hi = stack.pop()
+                index_array = order[lo:hi]
+                self.min_x_list[node] = float(self.array_map['min_x'][index_array].min())
+                self.min_y_list[node] = float(self.array_map['min_y'][index_array].min())
+                self.max_x_list[node] = float(self.array_map['max_x'][index_array].max())
+                self.max_y_list[node] = float(self.array_map['max_y'][index_array].max())
+                x = center_x[index_array]
+                y = center_y[index_array]
+                x_spread = x.max() - x.min()
+                y_spread = y.max() - y.min()
+                if hi - lo <= self.leaf_size or (x_spread == 0.0 and y_spread == 0.0):
+                    self.start_list[node] = lo
+                    self.count_list[node] = hi - lo
+                    continue
+                mid = (hi - lo) // 2
+                order[lo:hi] = index_array[numpy.argpartition(x if x_spread >= y_spread else y, mid)]
+                self.left_list[node] = self._AddNode()
+                self.right_list[node] = self._AddNode()
+                stack.append((self.left_list[node], lo, lo + mid))
+                stack.append((self.right_list[node], lo + mid, hi))
+        self.order_array = order
+        self.order_list = order.tolist()
+        self.node_count = len(self.left_list)
+        self.node_array_map = {
+            'min_x': numpy.array(self.min_x_list), 'min_y': numpy.array(self.min_y_list),
+            'max_x': numpy.array(self.max_x_list), 'max_y': numpy.array(self.max_y_list),
+            'left': numpy.array(self.left_list, dtype=numpy.int64), 'right': numpy.array(self.right_list, dtype=numpy.int64),
+            'start': numpy.array(self.start_list, dtype=numpy.int64), 'count': numpy.array(self.count_list, dtype=numpy.int64)
+        }
+
+    def _AddNode(self):
+        self.min_x_list.append(0.0)
+        self.min_y_list.append(0.0)
+        self.max_x_list.append(0.0)
+        self.max_y_list.append(0.0)
+        self.left_list.append(-1)
+        self.right_list.append(-1)
+        self.start_list.append(0)
+        self.count_list.append(0)
+        return len(self.left_list) - 1
+
+    def FindTriangle(self, point, epsilon=1e-7):
+        # Return the index of the triangle containing the given point, to within epsilon, along with the barycentric
+        # coordinates of the point in that triangle, or (None, None) if there is no such triangle.  Like a linear search
+        # would, we return the triangle of least index when there are several.  Triangles are assumed to be wound CCW,
+        # and degenerate ones never contain anything.
+        if self.node_count == 0:
+            return None, None
+        x = point.x
+        y = point.y
+        list_map = self.list_map
+        best_i = None
+        best_weights = None
+        stack = [0]
+        while len(stack) > 0:
+            node = stack.pop()
+            if x < self.min_x_list[node] - epsilon or x > self.max_x_list[node] + epsilon:
+                continue
+            if y < self.min_y_list[node] - epsilon or y > self.max_y_list[node] + epsilon:
+                continue
+            if self.left_list[node] >= 0:
+                stack.append(self.right_list[node])
+                stack.append(self.left_list[node])
+                continue
+            start = self.start_list[node]
+            for i in self.order_list[start:start + self.count_list[node]]:
+                if best_i is not None and i > best_i:
+                    continue
+                area = list_map['area'][i]
+                if area <= 0.0:
+                    continue
+                # The bounding box test keeps us from accepting points far off the sharp corners of thin triangles.
+                if x < list_map['min_x'][i] - epsilon or x > list_map['max_x'][i] + epsilon:
+                    continue
+                if y < list_map['min_y'][i] - epsilon or y > list_map['max_y'][i] + epsilon:
+                    continue
+                # Each weight is twice the signed area of the point with an edge, so it is the signed distance of
+                # the point from that edge, scaled by the length of the edge.
+                ax = list_map['ax'][i] - x
+                ay = list_map['ay'][i] - y
+                bx = list_map['bx'][i] - x
+                by = list_map['by'][i] - y
+                cx = list_map['cx'][i] - x
+                cy = list_map['cy'][i] - y
+                weight_a = bx * cy - by * cx
+                if weight_a < -epsilon * list_map['length_bc'][i]:
+                    continue
+                weight_b = cx * ay - cy * ax
+                if weight_b < -epsilon * list_map['length_ca'][i]:
+                    continue
+                weight_c = ax * by - ay * bx
+                if weight_c < -epsilon * list_map['length_ab'][i]:
+                    continue
+                best_i = i
+                best_weights = (weight_a / area, weight_b / area, weight_c / area)
+        return best_i, best_weights
+
+    def ContainsPoint(self, point, epsilon=1e-7):
+        return self.FindTriangle(point, epsilon)[0] is not None
+
+    def CastRay(self, origin, direction, max_t=float('inf'), epsilon=1e-7):
+        # Return the index of the first triangle hit by the ray origin + t * direction, for t in [0, max_t], along
+        # with the parameter t at which the ray enters it, or (None, None) if the ray hits nothing.  A ray starting
+        # inside a triangle hits it at t = 0.  Among triangles entered at the same t, we return the one of least index.
+        # Triangles are grown by epsilon just as FindTriangle grows them, and degenerate ones are never hit.  We visit
+        # nodes in order of where the ray enters their boxes, and skip any node entered after the best hit so far.
+        if self.node_count == 0:
+            return None, None
+        ox = origin.x
+        oy = origin.y
+        dx = direction.x
+        dy = direction.y
+        list_map = self.list_map
+        best_i = None
+        best_t = max_t
+        stack = []
+        t = self._EnterBox(0, ox, oy, dx, dy, max_t, epsilon)
+        if t is not None:
+            stack.append((0, t))
+        while len(stack) > 0:
+            node, t = stack.pop()
+            if t > best_t:
+                continue
+            if self.left_list[node] >= 0:
+                # Push the child entered later first, so that the one entered sooner is visited first.
+                child_list = []
+                for child in (self.left_list[node], self.right_list[node]):
+                    t = self._EnterBox(child, ox, oy, dx, dy, best_t, epsilon)
+                    if t is not None:
+                        child_list.append((child, t))
+                child_list.sort(key=lambda pair: -pair[1])
+                stack += child_list
+                continue
+            start = self.start_list[node]
+            for i in self.order_list[start:start + self.count_list[node]]:
+                if list_map['area'][i] <= 0.0:
+                    continue
+                # Clip the ray against the half-plane inside each edge, as in the Cyrus-Beck algorithm.  The signed
+                # distance of a point on the ray from an edge, scaled by the length of the edge, is linear in t.
+                t_min = 0.0
+                t_max = best_t
+                for px, py, qx, qy, length in (
+                    (list_map['ax'][i], list_map['ay'][i], list_map['bx'][i], list_map['by'][i], list_map['length_ab'][i]),
+                    (list_map['bx'][i], list_map['by'][i], list_map['cx'][i], list_map['cy'][i], list_map['length_bc'][i]),
+                    (list_map['cx'][i], list_map['cy'][i], list_map['ax'][i], list_map['ay'][i], list_map['length_ca'][i])
+                ):
+                    ex = qx - px
+                    ey = qy - py
+                    weight = ex * (oy - py) - ey * (ox - px) + epsilon * length
+                    rate = ex * dy - ey * dx
+                    if rate > 0.0:
+                        t_min = max(t_min, -weight / rate)
+                    elif rate < 0.0:
+                        t_max = min(t_max, -weight / rate)
+                    elif weight < 0.0:
+                        t_max = -1.0
+                    if t_min > t_max:
+                        break
+                if t_min > t_max:
+                    continue
+                if best_i is None or t_min < best_t or (t_min == best_t and i < best_i):
+                    best_i = i
+                    best_t = t_min
+        if best_i is None:
+            return None, None
+        return best_i, best_t
+
+    def _EnterBox(self, node, ox, oy, dx, dy, max_t, epsilon):
+        # Return the parameter at which the ray enters the given node's box, grown by epsilon, or None if it misses.
+        t_min = 0.0
+        t_max = max_t
+        for o, d, lo, hi in (
+            (ox, dx, self.min_x_list[node] - epsilon, self.max_x_list[node] + epsilon),
+            (oy, dy, self.min_y_list[node] - epsilon, self.max_y_list[node] + epsilon)
+        ):
+            if d == 0.0:
+                if o < lo or o > hi:
+                    return None
+                continue
+            t_a = (lo - o) / d
+            t_b = (hi - o) / d
+            if t_a > t_b:
+                t_a, t_b = t_b, t_a
+            t_min = max(t_min, t_a)
+            t_max = min(t_max, t_b)
+            if t_min > t_max:
+                return None
+        return t_min
+
+    def FindTriangles(self, point_array, epsilon=1e-7):
+        # This is a batch version of FindTriangle, taking a VectorArray, or a list of vectors, and returning an array
+        # of triangle indices, -1 where there is no triangle, and an N x 3 array of barycentric coordinates, NaN where
+        # there is no triangle.  All the points descend the tree together, as an array of (point, node) pairs.
+        from math2d_vector_array import VectorArray
+        if not isinstance(point_array, VectorArray):
+            point_array = VectorArray().FromVectors(point_array)
+        px = point_array.x
+        py = point_array.y
+        point_count = len(px)
+        best_array = numpy.full(point_count, self.triangle_count, dtype=numpy.int64)
+        node_map = self.node_array_map if self.node_count > 0 else None
+        array_map = self.array_map if self.node_count > 0 else None
+        point_index = numpy.arange(point_count) if self.node_count > 0 else numpy.zeros(0, dtype=numpy.int64)
+        node_index = numpy.zeros(len(point_index), dtype=numpy.int64)
+        while len(point_index) > 0:
+            x = px[point_index]
+            y = py[point_index]
+            inside = (x >= node_map['min_x'][node_index] - epsilon) & (x <= node_map['max_x'][node_index] + epsilon)
+            inside &= (y >= node_map['min_y'][node_index] - epsilon) & (y <= node_map['max_y'][node_index] + epsilon)
+            point_index = point_index[inside]
+            node_index = node_index[inside]
+            is_leaf = node_map['left'][node_index] < 0
+
+            # Test each point that reached a leaf against every triangle of that leaf.
+            leaf_point = point_index[is_leaf]
+            leaf_node = node_index[is_leaf]
+            count = node_map['count'][leaf_node]
+            total = int(count.sum())
+            if total > 0:
+                offset = numpy.arange(total) - numpy.repeat(numpy.cumsum(count) - count, count)
+                i = self.order_array[numpy.repeat(node_map['start'][leaf_node], count) + offset]
+                j = numpy.repeat(leaf_point, count)
+                hit = self._Contains(i, px[j], py[j], epsilon)
+                numpy.minimum.at(best_array, j[hit], i[hit])
+
+            interior_point = point_index[~is_leaf]
+            interior_node = node_index[~is_leaf]
+            point_index = numpy.concatenate((interior_point, interior_point))
+            node_index = numpy.concatenate((node_map['left'][interior_node], node_map['right'][interior_node]))
+
+        index_array = numpy.where(best_array < self.triangle_count, best_array, -1)
+        weight_array = numpy.full((point_count, 3), numpy.nan)
+        found = numpy.flatnonzero(index_array >= 0)
+        if len(found) > 0:
+            i = index_array[found]
+            ax = array_map['ax'][i] - px[found]
+            ay = array_map['ay'][i] - py[found]
+            bx = array_map['bx'][i] - px[found]
+            by = array_map['by'][i] - py[found]
+            cx = array_map['cx'][i] - px[found]
+            cy = array_map['cy'][i] - py[found]
+            area = array_map['area'][i]
+            weight_array[found, 0] = (bx * cy - by * cx) / area
+            weight_array[found, 1] = (cx * ay - cy * ax) / area
+            weight_array[found, 2] = (ax * by - ay * bx) / area
+        return index_array, weight_array
+
+    def _Contains(self, i, x, y, epsilon):
+        # This is the test of FindTriangle for many (triangle, point) pairs at once.
+        array_map = self.array_map
+        ax = array_map['ax'][i] - x
+        ay = array_map['ay'][i] - y
+        bx = array_map['bx'][i] - x
+        by = array_map['by'][i] - y
+        cx = array_map['cx'][i] - x
+        cy = array_map['cy'][i] - y
+        result = array_map['area'][i] > 0.0
+        result &= (x >= array_map['min_x'][i] - epsilon) & (x <= array_map['max_x'][i] + epsilon)
+        result &= (y >= array_map['min_y'][i] - epsilon) & (y <= array_map['max_y'][i] + epsilon)
+        result &= bx * cy - by * cx >= -epsilon * array_map['length_bc'][i]
+        result &= cx * ay - cy * ax >= -epsilon * array_map['length_ca'][i]
+        result &= ax * by - ay * bx >= -epsilon * array_map['length_ab'][i]
+        return result
+
+    def ContainsPoints(self, point_array, epsilon=1e-7):
+        # This is a batch version of ContainsPoint, returning an array of booleans.
+        return self.FindTriangles(point_array, epsilon)[0] >= 0
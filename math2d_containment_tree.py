@@ -0,0 +1,73 @@
+# math2d_containment_tree.py
+
+import math
+import heapq
+
+class ContainmentTree(object):
+    # This answers which of a given set of non-crossing polygons most tightly contains some other polygon,
+    # which is what we need to marry holes to perimeters.  The polygons are ordered by area, since of all the
+    # polygons containing some other, the smallest is the innermost.  Their bounding boxes are bucketed in a
+    # grid, so that a query need only consider those few polygons whose bounding box contains the query point.
+    # Any polygon whose bounding box would cover too many cells is instead put on a short list that every
+    # query considers.  Candidates are visited in order of area, and the first one containing the query wins.
+    MAX_CELLS = 64
+
+    def __init__(self, polygon_list, epsilon=1e-7):
+        self.epsilon = epsilon
+        self.polygon_list = polygon_list
+        self.area_list = [polygon.Area() for polygon in polygon_list]
+        self.box_list = [polygon.BoundingBox() for polygon in polygon_list]
+        self.order_list = sorted([k for k in range(len(polygon_list)) if self.box_list[k] is not None], key=lambda k: self.area_list[k])
+        self.cell_map = {}
+        self.large_list = []
+        self.cell_size = 1.0
+        if len(self.order_list) == 0:
+            return
+        # Size the cells after a typical polygon, so that most polygons land in only a few cells.
+        extent_list = sorted([max(box.Width(), box.Height()) for box in [self.box_list[k] for k in self.order_list]])
+        self.cell_size = max(extent_list[len(extent_list) // 2], epsilon)
+        for rank, k in enumerate(self.order_list):
+            box = self.box_list[k]
+            min_i, min_j = self._Cell(box.min_point.x - epsilon, box.min_point.y - epsilon)
+            max_i, max_j = self._Cell(box.max_point.x + epsilon, box.max_point.y + epsilon)
+            if (max_i - min_i + 1) * (max_j - min_j + 1) > self.MAX_CELLS:
+                self.large_list.append(rank)
+                continue
+            # Visiting the polygons in order of area keeps each bucket sorted by area as well.
+            for i in range(min_i, max_i + 1):
+                for j in range(min_j, max_j + 1):
+                    bucket = self.cell_map.get((i, j))
+                    if bucket is None:
+                        self.cell_map[(i, j)] = [rank]
+                    else:
+                        bucket.append(rank)
+
+    def _Cell(self, x, y):
+        return math.floor(x / self.cell_size), math.floor(y / self.cell_size)
+
+    def _Contains(self, k, polygon):
+        # Decide by the first vertex of the given polygon not on the border of the candidate.  Non-crossing polygons
+        # touching at a vertex or along an edge are told apart this way.
+        candidate = self.polygon_list[k]
+        box = self.box_list[k]
+        for point in polygon.vertex_list:
+            if point.x < box.min_point.x - self.epsilon or point.x > box.max_point.x + self.epsilon:
+                return False
+            if point.y < box.min_point.y - self.epsilon or point.y > box.max_point.y + self.epsilon:
+                return False
+            if not candidate.ContainsPointOnBorder(point, self.epsilon):
+                return candidate.WindingNumber(point) != 0
+        return False
+
+    def FindParent(self, polygon):
+        # Return the index of the smallest polygon of the tree containing the given polygon, or None if there is none.
+        if len(polygon.vertex_list) == 0 or len(self.order_list) == 0:
+            return None
+        area = polygon.Area()
+        point = polygon.vertex_list[0]
+        bucket = self.cell_map.get(self._Cell(point.x, point.y), [])
+        for rank in heapq.merge(bucket, self.large_list):
+            k = self.order_list[rank]
+            if self.area_list[k] >= area and self._Contains(k, polygon):
+                return k
+        return None
@@ -0,0 +1,200 @@
+# math2d_convex_hull.py
+
+import math
+import bisect
+
+class ConvexHull(object):
+    # This finds the convex hull of a set of points using quickhull, each step of which is done for all the points
+    # concerned at once with numpy.  We start with the left-most and right-most points, which are on the hull.  For
+    # each edge of the hull found so far, the point farthest to its outside is also on the hull, so we split the edge
+    # there, and recur on the points outside either new edge, until no point is outside of any edge.  Points within
+    # epsilon of an edge never count as outside of it, so no hull vertex is ever redundant.  This is O(n log n) on
+    # average, and nearly all the points are thrown out by the first split or two.
+    def __init__(self, epsilon=1e-7):
+        self.epsilon = epsilon
+
+    def GenerateIndices(self, point_array):
+        # Return the indices of the points of the hull, CCW.  The given points are a VectorArray, or a list of vectors.
+        import numpy
+        from math2d_vector_array import VectorArray
+        if not isinstance(point_array, VectorArray):
+            point_array = VectorArray().FromVectors(point_array)
+        x = point_array.x
+        y = point_array.y
+        if len(x) == 0:
+            return []
+        # Of the points with the least x, take the one with the least y, and likewise at the other end.
+        index_array = numpy.flatnonzero(x == x.min())
+        a = int(index_array[numpy.argmin(y[index_array])])
+        index_array = numpy.flatnonzero(x == x.max())
+        b = int(index_array[numpy.argmax(y[index_array])])
+        if x[a] == x[b] and y[a] == y[b]:
+            return [a]
+
+        def Outside(i, j, index_array, x_array, y_array):
+            # Return those of the given points more than epsilon to the right of the line from point i to point j, and
+            # how far to the right they are, scaled by the length of the line.  We carry the coordinates of the points
+            # along with their indices, as gathering them anew each time is slow.
+            dx = x[j] - x[i]
+            dy = y[j] - y[i]
+            distance = dy * x_array - dx * y_array
+            mask = distance > self.epsilon * (dx * dx + dy * dy) ** 0.5 + dy * x[i] - dx * y[i]
+            return index_array[mask], x_array[mask], y_array[mask], distance[mask]
+
+        # Going CCW, the hull runs from a to b below the line between them, and back from b to a above it.
+        index_array = numpy.arange(len(x))
+        hull = []
+        stack = [('edge', b, a, index_array, x, y), ('point', b), ('edge', a, b, index_array, x, y), ('point', a)]
+        while len(stack) > 0:
+            item = stack.pop()
+            if item[0] == 'point':
+                hull.append(item[1])
+                continue
+            i, j = item[1:3]
+            index_array, x_array, y_array, distance = Outside(*item[1:])
+            if len(index_array) == 0:
+                continue
+            k = int(index_array[numpy.argmax(distance)])
+            stack.append(('edge', k, j, index_array, x_array, y_array))
+            stack.append(('point', k))
+            stack.append(('edge', i, k, index_array, x_array, y_array))
+
+        # Splitting at the farthest point can still leave a vertex within epsilon of the line through its neighbors.
+        removed = True
+        while removed and len(hull) > 3:
+            removed = False
+            for n in range(len(hull)):
+                i = hull[n - 1]
+                k = hull[n]
+                j = hull[(n + 1) % len(hull)]
+                dx = x[j] - x[i]
+                dy = y[j] - y[i]
+                if dy * (x[k] - x[i]) - dx * (y[k] - y[i]) <= self.epsilon * (dx * dx + dy * dy) ** 0.5:
+                    del hull[n]
+                    removed = True
+                    break
+        return hull
+
+class StreamingConvexHull(object):
+    # This keeps the convex hull of a stream of points up to date as the points arrive.  The hull is kept as its
+    # lower and upper chains, each running from left to right, with points ordered by x, then by y.  A new point
+    # is located in each chain by binary search, and if it is on or inside both, then it is inside the hull and
+    # we're done in O(log h) time.  Otherwise, it is inserted into the chain it is outside of, and any neighbors
+    # it makes redundant are removed.  The current hull is had as a polygon whose vertices are the very points we
+    # were given, and which is only regenerated when the hull changes, so callers must not modify it in place.
+    def __init__(self, epsilon=1e-7):
+        self.epsilon = epsilon
+        self.lower_list = []
+        self.lower_key_list = []
+        self.upper_list = []
+        self.upper_key_list = []
+        self.polygon = None
+
+    def Add(self, other):
+        # Add a point, or every point of a polygon, point cloud, vector array or iterable.  The iterable may give points or
+        # chunks of points.  Return true if the hull changed.
+        from math2d_vector import Vector
+        from math2d_vector_array import VectorArray
+        from math2d_polygon import Polygon
+        from math2d_point_cloud import PointCloud
+        if isinstance(other, Vector):
+            return self._AddPoint(other)
+        if isinstance(other, VectorArray):
+            # Only the hull of a chunk can change our hull, and that is quickly found for all the chunk at once.
+            other = [other[i] for i in ConvexHull(self.epsilon).GenerateIndices(other)]
+        elif isinstance(other, Polygon):
+            other = other.vertex_list
+        elif isinstance(other, PointCloud):
+            other = other.point_list
+        changed = False
+        for item in other:
+            if self._AddPoint(item) if isinstance(item, Vector) else self.Add(item):
+                changed = True
+        return changed
+
+    def Follow(self, feed):
+        # Add the given chunks of points as they come, yielding the hull after each one.
+        for chunk in feed:
+            self.Add(chunk)
+            yield self.GeneratePolygon()
+
+    def Size(self):
+        if len(self.lower_list) < 2:
+            return len(self.lower_list)
+        return len(self.lower_list) + len(self.upper_list) - 2
+
+    def _Outside(self, point_list, key_list, sign, point, key):
+        # Return where the given point goes in the given chain, and whether it is outside of the chain by more than
+        # epsilon.  The outside of the lower chain is below it, and the outside of the upper chain above it.
+        i = bisect.bisect_left(key_list, key)
+        if i < len(key_list) and key_list[i] == key:
+            return i, False
+        if i == 0 or i == len(key_list):
+            return i, True
+        a = point_list[i - 1]
+        b = point_list[i]
+        dx = b.x - a.x
+        dy = b.y - a.y
+        return i, sign * (dy * (point.x - a.x) - dx * (point.y - a.y)) > self.epsilon * math.sqrt(dx * dx + dy * dy)
+
+    def _IsRedundant(self, a, b, c, sign):
+        # A point of a chain is redundant if it is within epsilon of the line through its neighbors, or inside of it.
+        dx = c.x - a.x
+        dy = c.y - a.y
+        return sign * (dy * (b.x - a.x) - dx * (b.y - a.y)) <= self.epsilon * math.sqrt(dx * dx + dy * dy)
+
+    def _Insert(self, point_list, key_list, sign, point, key, i):
+        point_list.insert(i, point)
+        key_list.insert(i, key)
+        j = i + 1
+        while j + 1 < len(point_list) and self._IsRedundant(point, point_list[j], point_list[j + 1], sign):
+            j += 1
+        k = i
+        while k > 1 and self._IsRedundant(point_list[k - 2], point_list[k - 1], point, sign):
+            k -= 1
+        del point_list[i + 1:j]
+        del key_list[i + 1:j]
+        del point_list[k:i]
+        del key_list[k:i]
+
+    def _AddPoint(self, point):
+        key = (point.x, point.y)
+        if len(self.lower_list) == 0:
+            self.lower_list.append(point)
+            self.lower_key_list.append(key)
+            self.upper_list.append(point)
+            self.upper_key_list.append(key)
+            self.polygon = None
+            return True
+        i, lower_outside = self._Outside(self.lower_list, self.lower_key_list, 1.0, point, key)
+        j, upper_outside = self._Outside(self.upper_list, self.upper_key_list, -1.0, point, key)
+        if not lower_outside and not upper_outside:
+            return False
+        if len(self.lower_list) == 1 and self.lower_list[0].IsPoint(point, self.epsilon):
+            return False
+        if lower_outside:
+            self._Insert(self.lower_list, self.lower_key_list, 1.0, point, key, i)
+        if upper_outside:
+            self._Insert(self.upper_list, self.upper_key_list, -1.0, point, key, j)
+        self.polygon = None
+        return True
+
+    def ContainsPoint(self, point):
+        # Tell whether the given point is on or inside the hull, to within epsilon, in O(log h) time.
+        if len(self.lower_list) == 0:
+            return False
+        key = (point.x, point.y)
+        if len(self.lower_list) == 1:
+            return self.lower_list[0].IsPoint(point, self.epsilon)
+        return not self._Outside(self.lower_list, self.lower_key_list, 1.0, point, key)[1] and not self._Outside(self.upper_list, self.upper_key_list, -1.0, point, key)[1]
+
+    def GeneratePolygon(self):
+        # Return the current hull as a CCW polygon.  Until the hull changes, this is the same polygon every time.
+        from math2d_polygon import Polygon
+        if self.polygon is None:
+            self.polygon = Polygon()
+            if len(self.lower_list) < 2:
+                self.polygon.vertex_list = list(self.lower_list)
+            else:
+                self.polygon.vertex_list = self.lower_list + self.upper_list[-2:0:-1]
+        return self.polygon
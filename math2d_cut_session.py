@@ -0,0 +1,47 @@
+# math2d_cut_session.py
+
+from math2d_planar_graph import PlanarGraph, PlanarGraphEdgeLabel
+
+class CutSession(object):
+    # This is for cutting one base region against many cutters.  The arrangement of the base region, the
+    # index of its edges' bounding boxes, its half-edge structure and the region's point locator are all
+    # built once, up front.  Inserting a cutter of m edges then looks only at the base edges whose boxes
+    # overlap the cutter's, and splits only those it hits, in about O(m log n) time for a base of n edges.
+    # Reading the resulting region off the arrangement still takes time in proportion to the whole result,
+    # which includes every base edge, so a cut with a small cutter costs less than a one-shot CutAgainst,
+    # but still grows with the base.  The result is read off a working copy of the edge list, so the
+    # arrangement itself is left intact.  Unless told to roll back, a cut leaves its cutter in the
+    # arrangement, so that the next cut is made against both, after the edge index is rebuilt for the
+    # bigger arrangement.  Roll back to get the bare base arrangement, and its index, again.  Changes made
+    # to the base region after the session has been created go unnoticed.
+    def __init__(self, region, epsilon=1e-7):
+        self.region = region
+        self.epsilon = epsilon
+        self.graph = PlanarGraph()
+        self.graph.AddMany(region, {'edge_label': PlanarGraphEdgeLabel.REGION_BORDER}, epsilon)
+        self.locator = region.Locator(epsilon)
+        self.graph.segment_index.Sync(self.graph, epsilon)
+        self.graph.HalfEdges()
+        # AddMany never modifies the edge list in place, so we can hold on to the base one.
+        self.base_vertex_count = len(self.graph.vertex_list)
+        self.base_edge_list = self.graph.edge_list
+
+    def Cut(self, cutter, rollback=True):
+        # Return the base region cut against the given cutter, and against any cutters kept from previous cuts.
+        self.graph.AddMany(cutter, {'edge_label': PlanarGraphEdgeLabel.CUT}, self.epsilon)
+        graph = PlanarGraph()
+        graph.vertex_list = self.graph.vertex_list
+        graph.edge_list = self.graph.edge_list
+        # The locator answers containment just like the region would, only faster.
+        result = graph.ApplyCuts(self.locator)
+        if rollback:
+            self.Rollback()
+        return result
+
+    def Rollback(self):
+        # Forget all cutters, returning to the base arrangement.  The vertex index is told which vertices
+        # are going away, so that it doesn't need to be rebuilt for the next cut.
+        graph = self.graph
+        graph.vertex_index.Sync(graph.vertex_list).Truncate(self.base_vertex_count)
+        del graph.vertex_list[self.base_vertex_count:]
+        graph.edge_list = self.base_edge_list
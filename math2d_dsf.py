@@ -6,12 +6,17 @@ class DisjointSet(object):
         self.data = data
 
     def FindRepresentative(self):
-        if self.rep is None:
-            return self
-        else:
-            rep = self.rep.FindRepresentative()
-            self.rep = rep # This is strictly an optimization.  It is not needed for correctness.
-            return rep
+        # Walk up to the representative, then point everything on the way directly at it.
+        # This used to be recursive, which could hit the recursion limit on long chains.
+        rep = self
+        while rep.rep is not None:
+            rep = rep.rep
+        dsf_set = self
+        while dsf_set is not rep:
+            next_set = dsf_set.rep
+            dsf_set.rep = rep # This is strictly an optimization.  It is not needed for correctness.
+            dsf_set = next_set
+        return rep
 
     def MergeWith(self, dsf_set):
         if self != dsf_set:
@@ -21,4 +26,60 @@ class DisjointSet(object):
     def __eq__(self, other):
         rep_a = self.FindRepresentative()
         rep_b = other.FindRepresentative()
-        return True if rep_a is rep_b else False
\ No newline at end of file
+        return True if rep_a is rep_b else False
+
+class DisjointSetForest(object):
+    # This is a disjoint-set forest over the integers 0 through size - 1, kept in flat lists rather than one
+    # object per element.  We use union by rank and path compression, so that any sequence of operations
+    # takes nearly linear time, and Find is iterative, so that no chain is ever too long for it.
+    def __init__(self, size=0):
+        self.parent_list = list(range(size))
+        self.rank_list = [0] * size
+
+    def __len__(self):
+        return len(self.parent_list)
+
+    def Add(self):
+        i = len(self.parent_list)
+        self.parent_list.append(i)
+        self.rank_list.append(0)
+        return i
+
+    def Find(self, i):
+        parent_list = self.parent_list
+        root = i
+        while parent_list[root] != root:
+            root = parent_list[root]
+        while parent_list[i] != root:
+            parent_list[i], i = root, parent_list[i]
+        return root
+
+    def Union(self, i, j):
+        # Merge the sets containing the given elements, returning false if they were already the same set.
+        i = self.Find(i)
+        j = self.Find(j)
+        if i == j:
+            return False
+        if self.rank_list[i] < self.rank_list[j]:
+            i, j = j, i
+        self.parent_list[j] = i
+        if self.rank_list[i] == self.rank_list[j]:
+            self.rank_list[i] += 1
+        return True
+
+    def IsSameSet(self, i, j):
+        return self.Find(i) == self.Find(j)
+
+    def GenerateSets(self):
+        # Return the sets as lists of elements, ordered by their smallest element, each in ascending order.
+        set_map = {}
+        set_list = []
+        for i in range(len(self.parent_list)):
+            root = self.Find(i)
+            k = set_map.get(root)
+            if k is None:
+                set_map[root] = len(set_list)
+                set_list.append([i])
+            else:
+                set_list[k].append(i)
+        return set_list
@@ -3,6 +3,7 @@
 from math2d_vector import Vector
 from math2d_planar_graph import PlanarGraph
 from math2d_line_segment import LineSegment
+from math2d_vertex_index import VertexIndex
 
 class GraphVertex(object):
     def __init__(self, point):
@@ -29,6 +30,7 @@ class Graph(object):
     # These are undirected graphs that need not be planar.
     def __init__(self):
         self.vertex_list = []
+        self.vertex_index = VertexIndex(attribute='point')
 
     def FromPlanarGraph(self, planar_graph):
         self.vertex_list = [GraphVertex(vertex) for vertex in planar_graph.vertex_list]
@@ -59,9 +61,7 @@ class Graph(object):
         pass
 
     def FindVertex(self, point):
-        for i, vertex in enumerate(self.vertex_list):
-            if vertex.point.IsPoint(point):
-                return i
+        return self.vertex_index.Sync(self.vertex_list).Find(point)
 
     def Disconnect(self, i, j):
         vertex_a = self.vertex_list[i]
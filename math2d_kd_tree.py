@@ -0,0 +1,208 @@
+# math2d_kd_tree.py
+
+import heapq
+
+class KDTree(object):
+    # This is a 2-d tree for nearest-neighbor and radius queries.  Like the vertex index, it does not own any
+    # points, but stores integer indices into a list of points that it is kept in sync with.  When first synced,
+    # the tree is built in bulk, splitting each node at the median along the axis of greater spread, which keeps
+    # it balanced.  After that, appending to the list is picked up incrementally by Sync(), each new point being
+    # dropped into the leaf it falls in, and that leaf split in two once it gets too big.  Replacing the list,
+    # shrinking it, or replacing its last item causes a rebuild, as does appending more points than we had.
+    # Replacing some other item of the list in place goes unnoticed, so callers doing that must call Invalidate().
+    # Nodes live in flat lists.  Interior nodes have a split axis (0 for x, 1 for y) and value, with everything
+    # on the left at or below the split value and everything on the right at or above it.  Leaves have axis -1
+    # and a bucket of point indices.
+    def __init__(self, leaf_size=16):
+        self.leaf_size = leaf_size
+        self.Invalidate()
+
+    def Invalidate(self):
+        self.item_list = None
+        self.last_item = None
+        self.size = 0
+        self.x_list = []
+        self.y_list = []
+        self.axis_list = []
+        self.split_list = []
+        self.left_list = []
+        self.right_list = []
+        self.bucket_list = []
+
+    def Sync(self, item_list):
+        if item_list is not self.item_list or len(item_list) < self.size or (self.size > 0 and item_list[self.size - 1] is not self.last_item) or len(item_list) > 2 * self.size:
+            self._Build(item_list)
+        else:
+            while self.size < len(item_list):
+                self._Insert(self.size)
+                self.size += 1
+        if self.size > 0:
+            self.last_item = item_list[self.size - 1]
+        return self
+
+    def _AddNode(self, axis=-1, split=0.0, left=-1, right=-1, bucket=None):
+        self.axis_list.append(axis)
+        self.split_list.append(split)
+        self.left_list.append(left)
+        self.right_list.append(right)
+        self.bucket_list.append(bucket)
+        return len(self.axis_list) - 1
+
+    def _Build(self, item_list):
+        import numpy
+        self.Invalidate()
+        self.item_list = item_list
+        self.size = len(item_list)
+        x_array = numpy.fromiter((point.x for point in item_list), dtype=numpy.float64, count=self.size)
+        y_array = numpy.fromiter((point.y for point in item_list), dtype=numpy.float64, count=self.size)
+        self.x_list = x_array.tolist()
+        self.y_list = y_array.tolist()
+        self._AddNode(bucket=[])
+        stack = [(0, numpy.arange(self.size))]
+        while len(stack) > 0:
+            node, index_array = stack.pop()
+            if len(index_array) <= self.leaf_size:
+                self.bucket_list[node] = index_array.tolist()
+                continue
+            x = x_array[index_array]
+            y = y_array[index_array]
+            x_spread = x.max() - x.min()
+            y_spread = y.max() - y.min()
+            if x_spread == 0.0 and y_spread == 0.0:
+                # These points all coincide, so there's no splitting them.
+                self.bucket_list[node] = index_array.tolist()
+                continue
+            axis = 0 if x_spread >= y_spread else 1
+            value = x if axis == 0 else y
+            mid = len(index_array) // 2
+            order = numpy.argpartition(value, mid)
+            left = self._AddNode(bucket=[])
+            right = self._AddNode(bucket=[])
+            self.axis_list[node] = axis
+            self.split_list[node] = float(value[order[mid]])
+            self.left_list[node] = left
+            self.right_list[node] = right
+            self.bucket_list[node] = None
+            stack.append((left, index_array[order[:mid]]))
+            stack.append((right, index_array[order[mid:]]))
+
+    def _Insert(self, i):
+        point = self.item_list[i]
+        self.x_list.append(point.x)
+        self.y_list.append(point.y)
+        node = 0
+        while self.axis_list[node] >= 0:
+            coordinate = point.x if self.axis_list[node] == 0 else point.y
+            node = self.left_list[node] if coordinate < self.split_list[node] else self.right_list[node]
+        bucket = self.bucket_list[node]
+        bucket.append(i)
+        if len(bucket) > 2 * self.leaf_size:
+            self._SplitLeaf(node)
+
+    def _SplitLeaf(self, node):
+        bucket = self.bucket_list[node]
+        x_spread = max([self.x_list[i] for i in bucket]) - min([self.x_list[i] for i in bucket])
+        y_spread = max([self.y_list[i] for i in bucket]) - min([self.y_list[i] for i in bucket])
+        if x_spread == 0.0 and y_spread == 0.0:
+            return
+        axis = 0 if x_spread >= y_spread else 1
+        coordinate_list = self.x_list if axis == 0 else self.y_list
+        bucket = sorted(bucket, key=lambda i: coordinate_list[i])
+        mid = len(bucket) // 2
+        self.axis_list[node] = axis
+        self.split_list[node] = coordinate_list[bucket[mid]]
+        self.left_list[node] = self._AddNode(bucket=bucket[:mid])
+        self.right_list[node] = self._AddNode(bucket=bucket[mid:])
+        self.bucket_list[node] = None
+
+    def KNearest(self, point, k):
+        # Return up to k (index, distance) pairs for the points nearest the given point, nearest first.
+        # We visit the nearer child of each node first, and skip any node that can't hold anything nearer
+        # than the k-th nearest point found so far.
+        if self.size == 0 or k <= 0:
+            return []
+        heap = [] # This is a max-heap of (-squared distance, -index), so that among equals, we keep lower indices.
+        stack = [(0, 0.0)]
+        while len(stack) > 0:
+            node, bound = stack.pop()
+            if len(heap) == k and bound > -heap[0][0]:
+                continue
+            axis = self.axis_list[node]
+            if axis < 0:
+                for i in self.bucket_list[node]:
+                    dx = self.x_list[i] - point.x
+                    dy = self.y_list[i] - point.y
+                    entry = (-(dx * dx + dy * dy), -i)
+                    if len(heap) < k:
+                        heapq.heappush(heap, entry)
+                    elif entry > heap[0]:
+                        heapq.heapreplace(heap, entry)
+                continue
+            diff = (point.x if axis == 0 else point.y) - self.split_list[node]
+            if diff < 0.0:
+                near, far = self.left_list[node], self.right_list[node]
+            else:
+                near, far = self.right_list[node], self.left_list[node]
+            stack.append((far, max(bound, diff * diff)))
+            stack.append((near, bound))
+        return [(-negative_index, (-negative_distance_squared) ** 0.5) for negative_distance_squared, negative_index in sorted(heap, reverse=True)]
+
+    def Nearest(self, point):
+        # Return the index of the point nearest the given point, and its distance, or (None, None) if there are no points.
+        # This is KNearest for k = 1, but without the heap, since it's the most common query by far.
+        if self.size == 0:
+            return None, None
+        x = point.x
+        y = point.y
+        x_list = self.x_list
+        y_list = self.y_list
+        best_i = None
+        best_distance_squared = float('inf')
+        stack = [(0, 0.0)]
+        while len(stack) > 0:
+            node, bound = stack.pop()
+            if bound > best_distance_squared:
+                continue
+            axis = self.axis_list[node]
+            if axis < 0:
+                for i in self.bucket_list[node]:
+                    dx = x_list[i] - x
+                    dy = y_list[i] - y
+                    distance_squared = dx * dx + dy * dy
+                    if distance_squared < best_distance_squared or (distance_squared == best_distance_squared and i < best_i):
+                        best_i = i
+                        best_distance_squared = distance_squared
+                continue
+            diff = (x if axis == 0 else y) - self.split_list[node]
+            if diff < 0.0:
+                stack.append((self.right_list[node], diff * diff if diff * diff > bound else bound))
+                stack.append((self.left_list[node], bound))
+            else:
+                stack.append((self.left_list[node], diff * diff if diff * diff > bound else bound))
+                stack.append((self.right_list[node], bound))
+        return best_i, best_distance_squared ** 0.5
+
+    def WithinRadius(self, point, radius):
+        # Return, in increasing order, the indices of all points within the given distance of the given point.
+        index_list = []
+        if self.size == 0 or radius < 0.0:
+            return index_list
+        radius_squared = radius * radius
+        stack = [(0, 0.0)]
+        while len(stack) > 0:
+            node, bound = stack.pop()
+            if bound > radius_squared:
+                continue
+            axis = self.axis_list[node]
+            if axis < 0:
+                for i in self.bucket_list[node]:
+                    dx = self.x_list[i] - point.x
+                    dy = self.y_list[i] - point.y
+                    if dx * dx + dy * dy <= radius_squared:
+                        index_list.append(i)
+                continue
+            diff = (point.x if axis == 0 else point.y) - self.split_list[node]
+            stack.append((self.left_list[node], max(bound, diff * diff) if diff > 0.0 else bound))
+            stack.append((self.right_list[node], max(bound, diff * diff) if diff < 0.0 else bound))
+        index_list.sort()
+        return index_list
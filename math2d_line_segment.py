@@ -38,9 +38,10 @@ class LineSegment(object):
             vector_a = self.point_b - self.point_a
             vector_b = point - self.point_a
             cross = vector_a.Cross(vector_b)
-            if math.fabs(cross) >= epsilon:
+            length_squared = vector_a.Dot(vector_a)
+            if cross * cross >= epsilon * epsilon * length_squared:
                 return None
-            lerp_value = vector_a.Dot(vector_b) / vector_a.Dot(vector_a)
+            lerp_value = vector_a.Dot(vector_b) / length_squared
             return lerp_value
         except ZeroDivisionError:
             return None
@@ -0,0 +1,129 @@
+# math2d_line_stroker.py
+
+import math
+
+import numpy
+
+class LineStroker(object):
+    # This turns a set of line-segments sharing end-points, such as the edges of a planar graph, into triangles
+    # covering those line-segments drawn with the given thickness.  Around each vertex, we sort the edges leaving
+    # it by heading.  Between each consecutive pair of edges, the sides of the two strokes meet at a miter point,
+    # found in closed form, if the pair turns by at most 180 degrees.  Otherwise, we bevel the joint with a point
+    # on each of the two sides.  Each joint is then a fan of triangles about its vertex, and each edge is a quad
+    # between the joints at its two ends.  A vertex with a single edge gets a flat end.  Everything is computed
+    # for all vertices and edges at once, and the result is a flat array of points with a flat array of triangles,
+    # each an index triple into the points, so no point is ever welded or searched for.
+    def __init__(self, thickness=0.5, epsilon=1e-7):
+        self.thickness = thickness
+        self.epsilon = epsilon
+
+    def Stroke(self, point_array, edge_array):
+        # The given points are a VectorArray, or a list of vectors, and the given edges are pairs of indices into
+        # them.  Edge direction doesn't matter, and repeated or degenerate edges are ignored.  We return a VectorArray
+        # holding the given points followed by the joint points, and an N x 3 array of CCW triangles.
+        from math2d_vector_array import VectorArray
+        if not isinstance(point_array, VectorArray):
+            point_array = VectorArray().FromVectors(point_array)
+        point_count = len(point_array)
+        px = point_array.x
+        py = point_array.y
+        half_thickness = self.thickness / 2.0
+        eps = self.epsilon
+
+        edge_array = numpy.asarray(edge_array, dtype=numpy.int64).reshape(-1, 2)
+        edge_array = numpy.sort(edge_array, axis=1)
+        edge_array = edge_array[edge_array[:, 0] != edge_array[:, 1]]
+        if len(edge_array) == 0:
+            return VectorArray(px.copy(), py.copy()), numpy.zeros((0, 3), dtype=numpy.int64)
+        edge_array = numpy.unique(edge_array, axis=0)
+
+        # Half-edge 2k leaves the first vertex of edge k, and half-edge 2k + 1 leaves the second.
+        # Sort the half-edges by origin, then by heading, so that each vertex's half-edges go CCW around it.
+        origin = edge_array.reshape(-1)
+        target = edge_array[:, ::-1].reshape(-1)
+        dx = px[target] - px[origin]
+        dy = py[target] - py[origin]
+        length = numpy.hypot(dx, dy)
+        ux = dx / length
+        uy = dy / length
+        heading = numpy.arctan2(dy, dx)
+        order = numpy.lexsort((heading, origin))
+        origin = origin[order]
+        ux = ux[order]
+        uy = uy[order]
+        heading = heading[order]
+        half_count = len(order)
+        position = numpy.empty(half_count, dtype=numpy.int64)
+        position[order] = numpy.arange(half_count)
+
+        # Find the next and previous half-edge CCW about the same vertex, wrapping around within each vertex.
+        index = numpy.arange(half_count)
+        is_first = numpy.ones(half_count, dtype=bool)
+        is_first[1:] = origin[1:] != origin[:-1]
+        is_last = numpy.ones(half_count, dtype=bool)
+        is_last[:-1] = origin[1:] != origin[:-1]
+        group_first = numpy.maximum.accumulate(numpy.where(is_first, index, 0))
+        group_last = numpy.minimum.accumulate(numpy.where(is_last, index, half_count)[::-1])[::-1]
+        next_index = numpy.where(is_last, group_first, index + 1)
+        prev_index = numpy.where(is_first, group_last, index - 1)
+
+        # Each half-edge and the next one CCW from it form a joint, and we find the angle it spans.
+        angle = numpy.mod(heading[next_index] - heading, 2.0 * math.pi)
+        angle[next_index == index] = 2.0 * math.pi
+        straight = numpy.fabs(angle - math.pi) < eps
+        miter = (straight | (angle < math.pi)) & (angle >= eps)
+        cx = px[origin]
+        cy = py[origin]
+
+        # The first point of each joint is on the left side of its first half-edge, where it meets the right side of
+        # the second half-edge at the miter point, if there is one.  Bevels get a second point on that right side.
+        tangent = numpy.tan(numpy.where(miter & ~straight, angle, math.pi / 2.0) / 2.0)
+        miter_length = numpy.where(miter & ~straight, half_thickness / tangent, 0.0)
+        first_x = cx - uy * half_thickness + ux * miter_length
+        first_y = cy + ux * half_thickness + uy * miter_length
+        last_x = cx + uy[next_index] * half_thickness
+        last_y = cy - ux[next_index] * half_thickness
+        count = numpy.where(miter, 1, 2)
+        first_index = point_count + numpy.cumsum(count) - count
+        last_index = first_index + count - 1
+        corner_count = int(count.sum())
+        out_x = numpy.empty(point_count + corner_count, dtype=numpy.float64)
+        out_y = numpy.empty(point_count + corner_count, dtype=numpy.float64)
+        out_x[:point_count] = px
+        out_y[:point_count] = py
+        out_x[first_index] = first_x
+        out_y[first_index] = first_y
+        bevel = ~miter
+        out_x[last_index[bevel]] = last_x[bevel]
+        out_y[last_index[bevel]] = last_y[bevel]
+
+        # The joint points of each vertex are contiguous and in CCW order, so each joint is a fan over them.
+        corner_origin = numpy.repeat(origin, count)
+        corner = numpy.arange(corner_count)
+        is_first = numpy.ones(corner_count, dtype=bool)
+        is_first[1:] = corner_origin[1:] != corner_origin[:-1]
+        is_last = numpy.ones(corner_count, dtype=bool)
+        is_last[:-1] = corner_origin[1:] != corner_origin[:-1]
+        group_first = numpy.maximum.accumulate(numpy.where(is_first, corner, 0))
+        corner_next = numpy.where(is_last, group_first, corner + 1)
+        joint_array = numpy.column_stack((corner_origin, point_count + corner, point_count + corner_next))
+
+        # Each edge is a quad spanning from the joints on either side of its half-edge at one end to those at the other.
+        a = position[0::2]
+        b = position[1::2]
+        right_a = last_index[prev_index[a]]
+        left_a = first_index[a]
+        right_b = last_index[prev_index[b]]
+        left_b = first_index[b]
+        quad_array = numpy.concatenate((
+            numpy.column_stack((right_a, left_b, right_b)),
+            numpy.column_stack((right_a, right_b, left_a))
+        ))
+
+        # Degenerate triangles, like those of a straight joint, are dropped.
+        triangle_array = numpy.concatenate((joint_array, quad_array))
+        ax = out_x[triangle_array[:, 0]]
+        ay = out_y[triangle_array[:, 0]]
+        cross = (out_x[triangle_array[:, 1]] - ax) * (out_y[triangle_array[:, 2]] - ay) - (out_y[triangle_array[:, 1]] - ay) * (out_x[triangle_array[:, 2]] - ax)
+        triangle_array = triangle_array[cross > eps]
+        return VectorArray(out_x, out_y), triangle_array
@@ -38,14 +38,32 @@ class LinearTransform(object):
             return False
         return True
     
+    def Matrix(self):
+        # This is the 2x2 matrix of the transform, row by row.
+        return (self.x_axis.x, self.y_axis.x, self.x_axis.y, self.y_axis.y)
+
+    def FromMatrix(self, matrix):
+        self.x_axis = Vector(matrix[0], matrix[2])
+        self.y_axis = Vector(matrix[1], matrix[3])
+        return self
+
     def Transform(self, object):
         if isinstance(object, Vector):
-            return self.x_axis * object.x + self.y_axis * object.y
+            return Vector(self.x_axis.x * object.x + self.y_axis.x * object.y, self.x_axis.y * object.x + self.y_axis.y * object.y)
         elif isinstance(object, LinearTransform):
             transform = LinearTransform()
             transform.x_axis = self.Transform(object.x_axis)
             transform.y_axis = self.Transform(object.y_axis)
             return transform
+
+    def TransformMany(self, point_list):
+        # Map a whole buffer of points in one pass.  Given a list of vectors, we return a new list of vectors.
+        # Given a VectorArray, we return a new VectorArray computed with a single vectorized expression.
+        m00, m01, m10, m11 = self.Matrix()
+        if isinstance(point_list, (list, tuple)):
+            return [Vector(m00 * point.x + m01 * point.y, m10 * point.x + m11 * point.y) for point in point_list]
+        from math2d_vector_array import VectorArray
+        return VectorArray(m00 * point_list.x + m01 * point_list.y, m10 * point_list.x + m11 * point_list.y)
     
     def __call__(self, object):
         return self.Transform(object)
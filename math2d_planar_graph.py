@@ -2,15 +2,226 @@
 
 import copy
 import math
+import bisect
 
 from math2d_line_segment import LineSegment
 from math2d_vector import Vector
+from math2d_vertex_index import VertexIndex
 
 class PlanarGraphEdgeLabel:
     NONE = 0
     REGION_BORDER = 1
     CUT = 2
 
+class PlanarGraphBooleanOperation:
+    UNION = 0
+    INTERSECTION = 1
+    DIFFERENCE = 2
+    SYMMETRIC_DIFFERENCE = 3
+
+class PlanarGraphHalfEdges(object):
+    # This is the half-edge adjacency structure backing a planar graph.  For each vertex, we keep its
+    # outgoing edges sorted by heading, which is what lets us find the next edge of a face by binary
+    # search instead of by scanning every edge in the graph.  We also keep the edges incident to each
+    # vertex, and the edges between each ordered pair of vertices.  All of these hold indices into the
+    # graph's edge list, which remains the authoritative, tuple-based representation of the graph.
+    # As with the vertex index, appending edges is picked up incrementally by Sync(), while replacing,
+    # shrinking or rewriting the end of the edge list causes a rebuild.  Replacing some other edge in
+    # place goes unnoticed, so callers doing that must call Invalidate().
+    def __init__(self):
+        self.Invalidate()
+
+    def Invalidate(self):
+        self.vertex_list = None
+        self.edge_list = None
+        self.last_edge = None
+        self.size = 0
+        self.heading_map = {}
+        self.outgoing_map = {}
+        self.incident_map = {}
+        self.edge_map = {}
+
+    def Sync(self, vertex_list, edge_list):
+        if vertex_list is not self.vertex_list or edge_list is not self.edge_list or len(edge_list) < self.size or (self.size > 0 and edge_list[self.size - 1] is not self.last_edge):
+            self.Invalidate()
+            self.vertex_list = vertex_list
+            self.edge_list = edge_list
+        while self.size < len(edge_list):
+            self._Insert(self.size)
+            self.size += 1
+        if self.size > 0:
+            self.last_edge = edge_list[self.size - 1]
+        return self
+
+    def _Insert(self, k):
+        edge = self.edge_list[k]
+        heading = (self.vertex_list[edge[1]] - self.vertex_list[edge[0]]).Heading()
+        heading_list = self.heading_map.setdefault(edge[0], [])
+        outgoing_list = self.outgoing_map.setdefault(edge[0], [])
+        # Ties in heading are broken by edge index so that we prefer earlier edges, as a linear scan would.
+        i = bisect.bisect_right(heading_list, heading)
+        while i > 0 and heading_list[i - 1] == heading and outgoing_list[i - 1] > k:
+            i -= 1
+        heading_list.insert(i, heading)
+        outgoing_list.insert(i, k)
+        self.incident_map.setdefault(edge[0], []).append(k)
+        if edge[1] != edge[0]:
+            self.incident_map.setdefault(edge[1], []).append(k)
+        self.edge_map.setdefault((edge[0], edge[1]), []).append(k)
+
+    def Incident(self, i):
+        return self.incident_map.get(i, [])
+
+    def Between(self, i, j):
+        return self.edge_map.get((i, j), [])
+
+    def NextEdge(self, k, wind_ccw=True, removed_set=None):
+        # Leaving along edge k, return the outgoing edge at its end that turns most to the left
+        # (or right) of it, never returning straight back along it.  We return None if there is
+        # no such edge.  This is the same rule FindCycleContainingEdge has always used.
+        edge = self.edge_list[k]
+        heading_list = self.heading_map.get(edge[1])
+        if heading_list is None:
+            return None
+        outgoing_list = self.outgoing_map[edge[1]]
+        back_heading = (self.vertex_list[edge[0]] - self.vertex_list[edge[1]]).Heading()
+        count = len(outgoing_list)
+        if wind_ccw:
+            # Sweep clockwise from the direction we came from.
+            i = bisect.bisect_left(heading_list, back_heading) - 1
+            step = -1
+        else:
+            # Sweep counter-clockwise from the direction we came from.
+            i = bisect.bisect_right(heading_list, back_heading)
+            step = 1
+        for n in range(count):
+            j = (i + n * step) % count
+            m = outgoing_list[j]
+            if self.edge_list[m][1] != edge[0] and (removed_set is None or m not in removed_set):
+                if step < 0:
+                    # Among edges of equal heading, prefer the earliest.
+                    while True:
+                        j_prev = (j - 1) % count
+                        m_prev = outgoing_list[j_prev]
+                        if j_prev == j or heading_list[j_prev] != heading_list[j] or self.edge_list[m_prev][1] == edge[0] or (removed_set is not None and m_prev in removed_set):
+                            break
+                        j, m = j_prev, m_prev
+                return m
+        return None
+
+class PlanarGraphSegmentIndex(object):
+    # This is a tree of bounding boxes over a list of line-segments, used to find the segments whose boxes overlap a
+    # given box without looking at any others.  It is built top-down, splitting the segments of each node at the
+    # median of their box centers along the axis of greater spread, so a query visits about O(log n + k) nodes, where
+    # k is the number of segments it returns.  Each box is grown by epsilon on every side.  Nodes live in flat lists.
+    # The index over a graph's own edges, along with its isolated vertices as zero-length segments, is kept in sync
+    # with the graph by Sync().  It is rebuilt whenever Sync() sees that the vertex or edge list was replaced, or
+    # changed in length, or that the last edge was replaced.  Replacing some other vertex or edge in place goes
+    # unnoticed, so callers doing that must call Invalidate().
+    def __init__(self, leaf_size=8):
+        self.leaf_size = leaf_size
+        self.Invalidate()
+
+    def Invalidate(self):
+        self.key = None
+        self.segment_list = []
+        self.edge_count = 0
+        self.min_x_list = []
+        self.min_y_list = []
+        self.max_x_list = []
+        self.max_y_list = []
+        self.left_list = []
+        self.right_list = []
+        self.bucket_list = []
+        self.box_list = []
+
+    def Sync(self, graph, epsilon=1e-7):
+        vertex_list = graph.vertex_list
+        edge_list = graph.edge_list
+        key = (vertex_list, len(vertex_list), edge_list, len(edge_list), edge_list[-1] if len(edge_list) > 0 else None, epsilon)
+        if self.key is None or any([key[k] is not self.key[k] for k in (0, 2, 4)]) or key[1] != self.key[1] or key[3] != self.key[3] or key[5] != self.key[5]:
+            used_set = set()
+            for edge in edge_list:
+                used_set.add(edge[0])
+                used_set.add(edge[1])
+            segment_list = [graph.EdgeSegment(edge) for edge in edge_list]
+            segment_list += [LineSegment(vertex, vertex) for i, vertex in enumerate(vertex_list) if i not in used_set]
+            self.Build(segment_list, epsilon)
+            self.edge_count = len(edge_list)
+            self.key = key
+        return self
+
+    def Build(self, segment_list, epsilon=1e-7):
+        import numpy
+        self.Invalidate()
+        self.segment_list = segment_list
+        self.edge_count = len(segment_list)
+        count = len(segment_list)
+        ax = numpy.fromiter((line_segment.point_a.x for line_segment in segment_list), dtype=numpy.float64, count=count)
+        ay = numpy.fromiter((line_segment.point_a.y for line_segment in segment_list), dtype=numpy.float64, count=count)
+        bx = numpy.fromiter((line_segment.point_b.x for line_segment in segment_list), dtype=numpy.float64, count=count)
+        by = numpy.fromiter((line_segment.point_b.y for line_segment in segment_list), dtype=numpy.float64, count=count)
+        min_x = numpy.minimum(ax, bx) - epsilon
+        min_y = numpy.minimum(ay, by) - epsilon
+        max_x = numpy.maximum(ax, bx) + epsilon
+        max_y = numpy.maximum(ay, by) + epsilon
+        self.box_list = list(zip(min_x.tolist(), min_y.tolist(), max_x.tolist(), max_y.tolist()))
+        if count == 0:
+            return self
+        center_x = (min_x + max_x) / 2.0
+        center_y = (min_y + max_y) / 2.0
+        self._AddNode()
+        stack = [(0, numpy.arange(count))]
+        while len(stack) > 0:
+            node, index_array = stack.pop()
+            self.min_x_list[node] = float(min_x[index_array].min())
+            self.min_y_list[node] = float(min_y[index_array].min())
+            self.max_x_list[node] = float(max_x[index_array].max())
+            self.max_y_list[node] = float(max_y[index_array].max())
+            x = center_x[index_array]
+            y = center_y[index_array]
+            x_spread = x.max() - x.min()
+            y_spread = y.max() - y.min()
+            if len(index_array) <= self.leaf_size or (x_spread == 0.0 and y_spread == 0.0):
+                self.bucket_list[node] = index_array.tolist()
+                continue
+            mid = len(index_array) // 2
+            order = numpy.argpartition(x if x_spread >= y_spread else y, mid)
+            self.left_list[node] = self._AddNode()
+            self.right_list[node] = self._AddNode()
+            stack.append((self.left_list[node], index_array[order[:mid]]))
+            stack.append((self.right_list[node], index_array[order[mid:]]))
+        return self
+
+    def _AddNode(self):
+        self.min_x_list.append(0.0)
+        self.min_y_list.append(0.0)
+        self.max_x_list.append(0.0)
+        self.max_y_list.append(0.0)
+        self.left_list.append(-1)
+        self.right_list.append(-1)
+        self.bucket_list.append(None)
+        return len(self.left_list) - 1
+
+    def Overlapping(self, box):
+        # Return the indices of the segments whose boxes overlap the given (min_x, min_y, max_x, max_y) box.
+        min_x, min_y, max_x, max_y = box
+        found_list = []
+        stack = [0] if len(self.left_list) > 0 else []
+        while len(stack) > 0:
+            node = stack.pop()
+            if self.min_x_list[node] > max_x or self.max_x_list[node] < min_x or self.min_y_list[node] > max_y or self.max_y_list[node] < min_y:
+                continue
+            if self.left_list[node] >= 0:
+                stack.append(self.left_list[node])
+                stack.append(self.right_list[node])
+                continue
+            for k in self.bucket_list[node]:
+                other_box = self.box_list[k]
+                if other_box[0] <= max_x and other_box[2] >= min_x and other_box[1] <= max_y and other_box[3] >= min_y:
+                    found_list.append(k)
+        return found_list
+
 class PlanarGraph(object):
     # These are graphs in the plane where no two edges non-trivially overlap.
     # Edges are ordered pairs, but stored as triples, the third entry being a label.
@@ -19,8 +230,11 @@ class PlanarGraph(object):
     # It should be noted here that we can't represent any planar graph with this class,
     # because we are restricting ourselves to edges that are line-segments.
     def __init__(self):
-        self.vertex_list = [] # For large graphs, points in a BSP tree would have been more efficient.
+        self.vertex_list = []
         self.edge_list = [] # Probably should have used a set for faster look-up times.
+        self.vertex_index = VertexIndex()
+        self.half_edges = PlanarGraphHalfEdges()
+        self.segment_index = PlanarGraphSegmentIndex()
 
     def Clear(self):
         self.vertex_list = []
@@ -41,27 +255,30 @@ class PlanarGraph(object):
         return self
     
     def FindVertex(self, point, add_if_not_found=False, epsilon=1e-7):
-        for i, vertex in enumerate(self.vertex_list):
-            if vertex.IsPoint(point, epsilon):
-                return i
+        i = self.vertex_index.Sync(self.vertex_list).Find(point, epsilon)
+        if i is not None:
+            return i
         if add_if_not_found:
             self.vertex_list.append(point)
             return len(self.vertex_list) - 1
         return None
     
+    def HalfEdges(self):
+        return self.half_edges.Sync(self.vertex_list, self.edge_list)
+
     def FindEdge(self, given_edge, ignore_direction=True, ignore_label=True):
-        for i, edge in enumerate(self.edge_list):
-            edges_match = False
-            if edge[0] == given_edge[0] and edge[1] == given_edge[1]:
-                edges_match = True
-            if ignore_direction and edge[0] == given_edge[1] and edge[1] == given_edge[0]:
-                edges_match = True
-            if edges_match and (ignore_label or edge[2] == given_edge[2]):
-                return i
-        return None
+        half_edges = self.HalfEdges()
+        index_list = half_edges.Between(given_edge[0], given_edge[1])
+        if ignore_direction:
+            index_list = index_list + half_edges.Between(given_edge[1], given_edge[0])
+        found = None
+        for i in index_list:
+            if (found is None or i < found) and (ignore_label or self.edge_list[i][2] == given_edge[2]):
+                found = i
+        return found
 
     def FindEdges(self, i):
-        return [edge for edge in self.edge_list if edge[0] == i or edge[1] == i]
+        return [self.edge_list[k] for k in self.HalfEdges().Incident(i)]
 
     def GenerateEdgeSegments(self):
         for edge in self.edge_list:
@@ -112,6 +329,7 @@ class PlanarGraph(object):
                     if point is not None:
                         if not edge_segment.IsEndPoint(point):
                             del self.edge_list[i]
+                            self.half_edges.Invalidate()
                             self.Add(LineSegment(edge_segment.point_a, point), {'edge_label': edge[2]}, epsilon, depth + 1)
                             self.Add(LineSegment(point, edge_segment.point_b), {'edge_label': edge[2]}, epsilon, depth + 1)
                         if not other.IsEndPoint(point):
@@ -134,11 +352,163 @@ class PlanarGraph(object):
             if k is not None:
                 if disposition.get('replace_edges', False):
                     self.edge_list[k] = new_edge
+                    self.half_edges.Invalidate()
                 elif disposition.get('duplicate_edges', False):
                     self.edge_list.append(new_edge)
             else:
                 self.edge_list.append(new_edge)
     
+    def GenerateLineSegments(self, other, disposition={}):
+        # Break the given object down into line-segments, each paired with its disposition,
+        # exactly as the Add method would have broken it down.
+        from math2d_region import Region, SubRegion
+        from math2d_polygon import Polygon
+        from math2d_aa_rect import AxisAlignedRectangle
+
+        if type(other) is list:
+            for item in other:
+                yield from self.GenerateLineSegments(item, disposition)
+
+        elif isinstance(other, PlanarGraph):
+            for edge in other.edge_list:
+                yield other.EdgeSegment(edge), {**disposition, 'edge_label': edge[2]}
+
+        elif isinstance(other, AxisAlignedRectangle):
+            yield from self.GenerateLineSegments(other.GeneratePolygon(), disposition)
+
+        elif isinstance(other, Region):
+            for sub_region in other.sub_region_list:
+                yield from self.GenerateLineSegments(sub_region, disposition)
+
+        elif isinstance(other, SubRegion):
+            yield from self.GenerateLineSegments(other.polygon, disposition)
+            for hole in other.hole_list:
+                yield from self.GenerateLineSegments(hole, {**disposition, 'flip_edge_direction': True})
+
+        elif isinstance(other, Polygon):
+            for line_segment in other.GenerateLineSegments():
+                yield line_segment, disposition
+
+        elif isinstance(other, LineSegment):
+            yield other, disposition
+
+    def AddMany(self, other, disposition={}, epsilon=1e-7):
+        # This is like the Add method, but builds the whole arrangement in one go.  Rather than scanning every
+        # vertex and edge for each inserted segment and recursing after every split, we find the pairs of segments
+        # whose bounding boxes overlap through trees of those boxes, collect every split point of every segment,
+        # and then insert the pieces of each segment in one pass.  For n segments, of which k pairs have
+        # overlapping boxes, that takes about O((n + k) log n) time.  Where a new segment runs along just part of an
+        # existing edge, Add leaves the two overlapping, each with its own label.  We split the existing edge
+        # instead, and keep both labels along the shared piece, so that the labels agree with those of Add.
+        new_list = list(self.GenerateLineSegments(other, disposition))
+        if len(new_list) == 0:
+            return
+
+        # Existing edges are already pair-wise non-crossing, so we only need to test pairs involving new segments.
+        # Isolated vertices take part as zero-length segments, since the incremental method splits new segments at
+        # them too.  The index over the existing segments is kept by the graph from one call to the next, so adding
+        # a few segments to a large graph that already has its index doesn't look at the rest of the graph.
+        fixed_index = self.segment_index.Sync(self, epsilon)
+        fixed_count = len(fixed_index.segment_list)
+        new_index = PlanarGraphSegmentIndex().Build([line_segment for line_segment, disposition in new_list], epsilon)
+        def Segment(k):
+            return fixed_index.segment_list[k] if k < fixed_count else new_index.segment_list[k - fixed_count]
+
+        split_map = {}
+        def SplitAt(k, point):
+            if not Segment(k).IsEndPoint(point, epsilon):
+                split_map.setdefault(k, []).append(point)
+
+        def SplitPair(j, k):
+            line_segment_a = Segment(j)
+            line_segment_b = Segment(k)
+            for point in [line_segment_b.point_a, line_segment_b.point_b]:
+                if line_segment_a.ContainsPoint(point, epsilon):
+                    SplitAt(j, point)
+            for point in [line_segment_a.point_a, line_segment_a.point_b]:
+                if line_segment_b.ContainsPoint(point, epsilon):
+                    SplitAt(k, point)
+            if not (line_segment_b.IsEndPoint(line_segment_a.point_a, epsilon) or line_segment_b.IsEndPoint(line_segment_a.point_b, epsilon)):
+                point = line_segment_a.IntersectWith(line_segment_b, epsilon)
+                if point is not None:
+                    SplitAt(j, point)
+                    SplitAt(k, point)
+
+        # Each new segment is tested against just those existing and earlier new segments whose boxes overlap its own.
+        for k, box in enumerate(new_index.box_list):
+            for j in fixed_index.Overlapping(box):
+                SplitPair(j, fixed_count + k)
+            for j in new_index.Overlapping(box):
+                if j < k:
+                    SplitPair(fixed_count + j, fixed_count + k)
+
+        # Now chop each segment into pieces at its split points, welding vertices as we go.  Each piece is
+        # returned along with the end vertices of the whole segment it came from.
+        def GeneratePieces(k):
+            line_segment = Segment(k)
+            vector = line_segment.Direction()
+            point_list = sorted(split_map.get(k, []), key=lambda point: vector.Dot(point - line_segment.point_a))
+            index_list = [self.FindVertex(point, add_if_not_found=True, epsilon=epsilon) for point in [line_segment.point_a] + point_list + [line_segment.point_b]]
+            if index_list[0] == index_list[-1]:
+                raise Exception('Tried to add degenerate line-segment.')
+            source = (index_list[0], index_list[-1]) if index_list[0] < index_list[-1] else (index_list[-1], index_list[0])
+            for i in range(len(index_list) - 1):
+                if index_list[i] != index_list[i + 1]:
+                    yield index_list[i], index_list[i + 1], source
+
+        # Only the existing edges that were hit are split.  The first piece of each takes its place in the edge list,
+        # and the others go on the end.  The edge map takes each piece made here to the first edge along it, and to
+        # the segment that edge came from.  Existing edges left whole are found through the half-edge structure.
+        half_edges = self.HalfEdges()
+        vertex_count = len(self.vertex_list)
+        edge_list = self.edge_list[:]
+        edge_map = {}
+        def Insert(edge, source, k=None):
+            key = (edge[0], edge[1]) if edge[0] < edge[1] else (edge[1], edge[0])
+            if k is None:
+                k = len(edge_list)
+                edge_list.append(edge)
+            else:
+                edge_list[k] = edge
+            entry = edge_map.get(key)
+            if entry is None or k < entry[0]:
+                edge_map[key] = (k, source)
+
+        split_edge_set = set([k for k in split_map if k < len(self.edge_list)])
+        for k in sorted(split_edge_set):
+            edge = self.edge_list[k]
+            for n, (i, j, source) in enumerate(GeneratePieces(k)):
+                Insert((i, j, edge[2]), source, k if n == 0 else None)
+
+        def FindEntry(key):
+            entry = edge_map.get(key)
+            if key[1] < vertex_count:
+                for m in half_edges.Between(key[0], key[1]) + half_edges.Between(key[1], key[0]):
+                    if m not in split_edge_set and (entry is None or m < entry[0]):
+                        entry = (m, key)
+            return entry
+
+        # A new piece along an edge that is the whole of its segment is handled according to the disposition, just
+        # as Add handles a new edge that duplicates an existing one.  A new piece along just part of an earlier
+        # segment is always kept, since Add would have left that segment whole, overlapped by the new one.
+        for k, (line_segment, disposition) in enumerate(new_list):
+            label = disposition.get('edge_label', PlanarGraphEdgeLabel.NONE)
+            for i, j, source in GeneratePieces(fixed_count + k):
+                if disposition.get('flip_edge_direction', False):
+                    new_edge = (j, i, label)
+                else:
+                    new_edge = (i, j, label)
+                key = (i, j) if i < j else (j, i)
+                entry = FindEntry(key)
+                if entry is None or entry[1] != key:
+                    Insert(new_edge, source)
+                elif disposition.get('replace_edges', False):
+                    edge_list[entry[0]] = new_edge
+                elif disposition.get('duplicate_edges', False):
+                    edge_list.append(new_edge)
+
+        self.edge_list = edge_list
+
     def RemoveVertex(self, i):
         if isinstance(i, Vector):
             i = self.FindVertex(i)
@@ -152,106 +522,163 @@ class PlanarGraph(object):
             )
                     
     def ApplyCuts(self, region):
-        # Turn all the cuts into bi-directional borders.  Discard cuts that don't cut anything.
-        region.Tessellate()
-        while True:
-            for i, edge in enumerate(self.edge_list):
-                if edge[2] == PlanarGraphEdgeLabel.CUT:
-                    break
+        # Here the region need only be something with a ContainsPoint method, such as a point locator.
+        # Turn all the cuts into bi-directional borders.  Discard cuts that don't cut anything, including those
+        # running along the region's border, and any cut along the same piece as another.
+        edge_list = [edge for edge in self.edge_list if edge[2] != PlanarGraphEdgeLabel.CUT]
+        used_set = set([(edge[0], edge[1]) if edge[0] < edge[1] else (edge[1], edge[0]) for edge in edge_list])
+        for edge in self.edge_list:
+            if edge[2] == PlanarGraphEdgeLabel.CUT:
+                key = (edge[0], edge[1]) if edge[0] < edge[1] else (edge[1], edge[0])
+                if key in used_set:
+                    continue
+                used_set.add(key)
+                edge_segment = self.EdgeSegment(edge)
+                if region.ContainsPoint(edge_segment.Lerp(0.5)):
+                    edge_list.append((edge[0], edge[1], PlanarGraphEdgeLabel.REGION_BORDER))
+                    edge_list.append((edge[1], edge[0], PlanarGraphEdgeLabel.REGION_BORDER))
+        self.edge_list = edge_list
+        return self._ReadRegion()
+
+    def ApplyBooleanOperation(self, region_a, region_b, operation, epsilon=1e-7):
+        # Here the graph is expected to hold the borders of region A labeled as region borders and those of region B
+        # labeled as cuts, each added with duplicate edges kept, so that every edge of either region survives with its
+        # direction.  Both regions have their interior on the left of their edges in the graph.  Each undirected piece
+        # of the arrangement then tells us, on each of its sides, whether we're in A and whether we're in B: from the
+        # piece's own edges if it came from that region, or else by locating its midpoint, since a piece that isn't
+        # on a region's border lies entirely on one side of it.  A piece is kept as a border of the result when the
+        # operation evaluates differently on its two sides, and is directed to have the result on its left.
+        if operation == PlanarGraphBooleanOperation.UNION:
+            evaluate = lambda in_a, in_b: in_a or in_b
+        elif operation == PlanarGraphBooleanOperation.INTERSECTION:
+            evaluate = lambda in_a, in_b: in_a and in_b
+        elif operation == PlanarGraphBooleanOperation.DIFFERENCE:
+            evaluate = lambda in_a, in_b: in_a and not in_b
+        elif operation == PlanarGraphBooleanOperation.SYMMETRIC_DIFFERENCE:
+            evaluate = lambda in_a, in_b: in_a != in_b
+        else:
+            raise Exception('Unknown boolean operation: %s' % str(operation))
+
+        # For each undirected piece, sum the directions of its edges from each region.  Since sub-regions don't
+        # overlap, a sum of +1 or -1 means the region is on just one side, while a sum of zero means the piece
+        # is shared by two sub-regions (or by a hole and a sub-region inside of it), so the region is on both sides.
+        piece_map = {}
+        for edge in self.edge_list:
+            if edge[0] < edge[1]:
+                key = (edge[0], edge[1])
+                sign = 1
             else:
-                break
-            del self.edge_list[i]
-            edge_segment = self.EdgeSegment(edge)
-            if region.ContainsPoint(edge_segment.Lerp(0.5)):
-                self.edge_list.append((edge[0], edge[1], PlanarGraphEdgeLabel.REGION_BORDER))
-                self.edge_list.append((edge[1], edge[0], PlanarGraphEdgeLabel.REGION_BORDER))
-                
-        # Now go read-off all the perimeter and hole polygons.
+                key = (edge[1], edge[0])
+                sign = -1
+            piece = piece_map.get(key)
+            if piece is None:
+                piece = [0, 0, False, False]
+                piece_map[key] = piece
+            if edge[2] == PlanarGraphEdgeLabel.CUT:
+                piece[1] += sign
+                piece[3] = True
+            else:
+                piece[0] += sign
+                piece[2] = True
+
+        locator_a = region_a.Locator(epsilon)
+        locator_b = region_b.Locator(epsilon)
+        def Sides(i, j, count, on_border, locator):
+            # Return whether the region is on the left and on the right of the piece going from i to j.
+            if on_border:
+                if count > 0:
+                    return True, False
+                if count < 0:
+                    return False, True
+                return True, True
+            inside = locator.ContainsPoint((self.vertex_list[i] + self.vertex_list[j]) / 2.0)
+            return inside, inside
+
+        edge_list = []
+        for (i, j), (count_a, count_b, on_border_a, on_border_b) in piece_map.items():
+            left_a, right_a = Sides(i, j, count_a, on_border_a, locator_a)
+            left_b, right_b = Sides(i, j, count_b, on_border_b, locator_b)
+            left = evaluate(left_a, left_b)
+            right = evaluate(right_a, right_b)
+            if left and not right:
+                edge_list.append((i, j, PlanarGraphEdgeLabel.REGION_BORDER))
+            elif right and not left:
+                edge_list.append((j, i, PlanarGraphEdgeLabel.REGION_BORDER))
+        self.edge_list = edge_list
+        return self._ReadRegion()
+
+    def _ReadRegion(self):
+        # Go read-off all the perimeter and hole polygons bordered by the region border edges of the graph.  Rather than delete
+        # the edges of each cycle from the edge list as we go, we mark them removed, and then compact the list once at the end.
         from math2d_polygon import Polygon
         perimeter_list = []
         hole_list = []
+        removed_set = set()
+        k = 0
         while True:
-            for edge in self.edge_list:
-                if edge[2] == PlanarGraphEdgeLabel.REGION_BORDER:
-                    break
-            else:
+            while k < len(self.edge_list) and (k in removed_set or self.edge_list[k][2] != PlanarGraphEdgeLabel.REGION_BORDER):
+                k += 1
+            if k == len(self.edge_list):
                 break
             polygon = Polygon()
-            cycle_list, cycle_found = self.FindCycleContainingEdge(edge, True)
-            polygon.vertex_list = [self.vertex_list[edge[0]] for edge in cycle_list]
+            cycle_list, cycle_found = self._FindCycle(k, True, removed_set)
+            polygon.vertex_list = [self.vertex_list[self.edge_list[i][0]] for i in cycle_list]
             if polygon.IsWoundCCW():
-                polygon.Tessellate()
+                # Tessellating used to do this for us, and we still want perimeters free of collinear vertices.
+                polygon.RemoveRedundantVertices()
                 perimeter_list.append(polygon)
             else:
-                cycle_list, cycle_found = self.FindCycleContainingEdge(edge, False)
-                polygon.vertex_list = [self.vertex_list[edge[0]] for edge in cycle_list]
+                cycle_list, cycle_found = self._FindCycle(k, False, removed_set)
+                polygon.vertex_list = [self.vertex_list[self.edge_list[i][0]] for i in cycle_list]
                 if polygon.IsWoundCW():
                     polygon.ReverseWinding()
                     hole_list.append(polygon)
                 else:
                     raise Exception('Failed to process cycle containing edge.')
-            for edge in cycle_list:
-                i = self.FindEdge(edge, False, False)
-                del self.edge_list[i]
+            removed_set.update(cycle_list)
+        self.edge_list = [edge for i, edge in enumerate(self.edge_list) if i not in removed_set]
         
-        # Finally, merry all the holes to the appropriate perimeters.
-        # TODO: This is a bit tricky.  A hole may lie inside a perimeter, but that doesn't mean it belongs to that perimeter,
-        #       because it may lie inside a yet smaller perimeter that is contained in a hole of the other perimeter.  Make sure
-        #       we assign holes to containing perimeters of the smallest area.  I think this may fix the problem.
+        # Finally, marry each hole to the smallest perimeter containing it.  Any larger perimeter containing the hole
+        # must also contain that smallest one, so it can only do so by way of one of its own holes.
         from math2d_region import Region, SubRegion
+        from math2d_containment_tree import ContainmentTree
         region = Region()
-        for perimeter in perimeter_list:
-            sub_region = SubRegion(perimeter)
-            new_hole_list = []
-            for hole in hole_list:
-                # I believe we need only test a single point on the hole.
-                if perimeter.ContainsPoint(hole.vertex_list[0]) and not perimeter.ContainsPointOnBorder(hole.vertex_list[0]):
-                    sub_region.hole_list.append(hole)
-                else:
-                    new_hole_list.append(hole)
-            hole_list = new_hole_list
-            region.sub_region_list.append(sub_region)
-        if len(hole_list) > 0:
-            raise Exception('Failed to marry %d holes to perimeters.' % len(hole_list))
+        region.sub_region_list = [SubRegion(perimeter) for perimeter in perimeter_list]
+        tree = ContainmentTree(perimeter_list)
+        unmarried_count = 0
+        for hole in hole_list:
+            k = tree.FindParent(hole)
+            if k is None:
+                unmarried_count += 1
+            else:
+                region.sub_region_list[k].hole_list.append(hole)
+        if unmarried_count > 0:
+            raise Exception('Failed to marry %d holes to perimeters.' % unmarried_count)
         
         return region
 
     def FindCycleContainingEdge(self, given_edge, wind_ccw=True, epsilon=1e-7):
         # This algorithm depends on the direction of the edges in the graph.
-        cycle_list = [given_edge]
+        k = self.FindEdge(given_edge, False, False)
+        if k is None:
+            return [given_edge], False
+        cycle_list, cycle_found = self._FindCycle(k, wind_ccw)
+        return [self.edge_list[i] for i in cycle_list], cycle_found
+
+    def _FindCycle(self, k, wind_ccw=True, removed_set=None):
+        # This is the index-based version of the above, which can also ignore a given set of removed edges.
+        half_edges = self.HalfEdges()
+        cycle_list = [k]
         cycle_found = True
         while True:
-            edge = cycle_list[len(cycle_list) - 1]
-            adjacency_list = self.FindAllAdjacencies(edge[1])
-            cur_heading = self.EdgeVector(edge)
-            j = -1
-            if wind_ccw:
-                largest_angle = -3.0 * math.pi
-                for i in range(len(adjacency_list)):
-                    adj_edge = adjacency_list[i]
-                    if adj_edge[1] != edge[0]:
-                        new_heading = self.EdgeVector(adj_edge)
-                        angle = cur_heading.SignedAngleBetween(new_heading)
-                        if angle > largest_angle:
-                            j = i
-                            largest_angle = angle
-            else:
-                smallest_angle = 3.0 * math.pi
-                for i in range(len(adjacency_list)):
-                    adj_edge = adjacency_list[i]
-                    if adj_edge[1] != edge[0]:
-                        new_heading = self.EdgeVector(adj_edge)
-                        angle = cur_heading.SignedAngleBetween(new_heading)
-                        if angle < smallest_angle:
-                            j = i
-                            smallest_angle = angle
-            if j == -1:
+            i = half_edges.NextEdge(cycle_list[-1], wind_ccw, removed_set)
+            if i is None or len(cycle_list) > len(self.edge_list):
+                # In the latter case, we've wandered onto some cycle that doesn't contain the given edge.
                 cycle_found = False
                 break
-            new_edge = adjacency_list[j]
-            if new_edge == given_edge:
+            if i == k:
                 break
-            cycle_list.append(new_edge)
+            cycle_list.append(i)
         return cycle_list, cycle_found
     
     def EdgeVector(self, edge):
@@ -262,7 +689,8 @@ class PlanarGraph(object):
     
     def FindAllAdjacencies(self, i, ignore_direction=False, vertices=False):
         adjacency_list = []
-        for edge in self.edge_list:
+        for k in self.HalfEdges().Incident(i):
+            edge = self.edge_list[k]
             if edge[0] == i:
                 if vertices:
                     adjacency_list.append(edge[1])
@@ -281,54 +709,56 @@ class PlanarGraph(object):
         # Here we ignore the direction of the edges of the graph.
         # If there is more than one connected component of the graph,
         # then this may not produce a desirable result.
-        graph = self.Copy()
+        graph = PlanarGraph()
+        graph.vertex_list = self.vertex_list
+        graph.edge_list = self.edge_list[:]
+        direction_set = set((edge[0], edge[1]) for edge in self.edge_list)
         for edge in self.edge_list:
-            reverse_edge = (edge[1], edge[0], edge[2])
-            i = graph.FindEdge(reverse_edge, ignore_direction=False)
-            if i is None:
-                graph.edge_list.append(reverse_edge)
+            if (edge[1], edge[0]) not in direction_set:
+                direction_set.add((edge[1], edge[0]))
+                graph.edge_list.append((edge[1], edge[0], edge[2]))
         from math2d_polygon import Polygon
         polygon_list = []
-        while len(graph.edge_list) > 0:
-            edge = graph.edge_list[0]
-            cycle_list, cycle_found = graph.FindCycleContainingEdge(edge, wind_ccw=True)
+        removed_set = set()
+        for k in range(len(graph.edge_list)):
+            if k in removed_set:
+                continue
+            cycle_list, cycle_found = graph._FindCycle(k, True, removed_set)
             if cycle_found:
                 polygon = Polygon()
-                polygon.vertex_list = [graph.vertex_list[edge[0]] for edge in cycle_list]
+                polygon.vertex_list = [graph.vertex_list[graph.edge_list[i][0]] for i in cycle_list]
                 if polygon.IsWoundCCW(epsilon):
                     polygon_list.append(polygon)
-            for edge in cycle_list:
-                i = graph.FindEdge(edge, False, False)
-                del graph.edge_list[i]
+            removed_set.update(cycle_list)
         return polygon_list
 
     def GenerateConnectedComponents(self):
-        from math2d_dsf import DisjointSet
+        # Return the connected components of the graph as sub-graphs, ignoring edge direction, along with a disjoint set
+        # for each vertex of the graph.  One pass of union-find over the edges gives us the components, and each sub-graph
+        # is then made by remapping vertex indices, rather than by adding its edges all over again.  Each component's
+        # vertices keep their relative order, as do its edges, and components are ordered by their first vertex.
+        from math2d_dsf import DisjointSet, DisjointSetForest
+        forest = DisjointSetForest(len(self.vertex_list))
+        for edge in self.edge_list:
+            forest.Union(edge[0], edge[1])
         sub_graph_list = []
-        dsf_set_list = [DisjointSet(i) for i in range(len(self.vertex_list))]
-        visited_vertex_set = set()
-        added_edges_set = set()
-        while len(visited_vertex_set) < len(self.vertex_list):
-            for i in range(len(self.vertex_list)):
-                if i not in visited_vertex_set:
-                    break
-            else:
-                break
-            queue = {i}
+        component_list = [None] * len(self.vertex_list)
+        index_list = [None] * len(self.vertex_list)
+        for vertex_list in forest.GenerateSets():
             sub_graph = PlanarGraph()
-            while len(queue) > 0:
-                i = queue.pop()
-                visited_vertex_set.add(i)
-                adj_edge_list = self.FindAllAdjacencies(i, ignore_direction=True)
-                for edge in adj_edge_list:
-                    dsf_set_list[edge[0]].MergeWith(dsf_set_list[edge[1]])
-                    for j in [edge[0], edge[1]]:
-                        if j not in visited_vertex_set and j not in queue:
-                            queue.add(j)
-                    if edge not in added_edges_set:
-                        sub_graph.Add(self.EdgeSegment(edge))
-                        added_edges_set.add(edge)
+            for i in vertex_list:
+                component_list[i] = len(sub_graph_list)
+                index_list[i] = len(sub_graph.vertex_list)
+                sub_graph.vertex_list.append(self.vertex_list[i])
             sub_graph_list.append(sub_graph)
+        for edge in self.edge_list:
+            sub_graph_list[component_list[edge[0]]].edge_list.append((index_list[edge[0]], index_list[edge[1]], edge[2]))
+        # The disjoint sets all point directly at their representative.
+        dsf_set_list = [DisjointSet(i) for i in range(len(self.vertex_list))]
+        for i, dsf_set in enumerate(dsf_set_list):
+            root = forest.Find(i)
+            if root != i:
+                dsf_set.rep = dsf_set_list[root]
         return sub_graph_list, dsf_set_list
 
     def Render(self, arrow_head_length=0.3):
@@ -353,91 +783,119 @@ class PlanarGraph(object):
             glEnd()
     
     def GenerateLineMesh(self, thickness=0.5, epsilon=1e-7):
-        half_thickness = thickness / 2.0
-        from math2d_tri_mesh import TriangleMesh, Triangle
-        from math2d_polygon import Polygon
-        from math2d_affine_transform import AffineTransform
+        # Stroke every edge of the graph with the given thickness, mitering the joints.
+        from math2d_tri_mesh import TriangleMesh
+        from math2d_line_stroker import LineStroker
+        point_array, triangle_array = LineStroker(thickness, epsilon).Stroke(self.vertex_list, [edge[:2] for edge in self.edge_list])
         mesh = TriangleMesh()
-        def SortKey(vector):
-            angle = Vector(1.0, 0.0).SignedAngleBetween(vector)
-            if angle < 0.0:
-                angle += 2.0 * math.pi
-            return angle
-        polygon_list = []
-        for i in range(len(self.vertex_list)):
-            center = self.vertex_list[i]
-            vector_list = []
-            adj_list = self.FindAllAdjacencies(i, ignore_direction=True, vertices=True)
-            for j in adj_list:
-                vector_list.append(self.vertex_list[j] - center)
-            vector_list.sort(key=SortKey)
-            polygon = Polygon()
-            for j in range(len(vector_list)):
-                vector_a = vector_list[j]
-                vector_b = vector_list[(j + 1) % len(vector_list)]
-                angle = vector_a.SignedAngleBetween(vector_b)
-                if angle < 0.0:
-                    angle += 2.0 * math.pi
-                if math.fabs(angle - math.pi) < epsilon or angle < math.pi:
-                    affine_transform = AffineTransform()
-                    affine_transform.translation = center
-                    affine_transform.linear_transform.x_axis = vector_a.Normalized()
-                    affine_transform.linear_transform.y_axis = affine_transform.linear_transform.x_axis.RotatedCCW90()
-                    if math.fabs(angle - math.pi) < epsilon:
-                        length = 0.0
-                    else:
-                        length = half_thickness / math.tan(angle / 2.0)
-                    point = affine_transform * Vector(length, half_thickness)
-                    polygon.vertex_list.append(point)
-                else:
-                    # Here we might create a rounded joint or something fancy, but this is good for now.
-                    polygon.vertex_list.append(vector_a.Normalized().RotatedCCW90().Scaled(half_thickness) + center)
-                    polygon.vertex_list.append(vector_b.Normalized().RotatedCW90().Scaled(half_thickness) + center)
-            polygon.Tessellate()
-            mesh.AddMesh(polygon.mesh)
-            polygon_list.append(polygon)
-        for edge in self.edge_list:
-            center_a = self.vertex_list[edge[0]]
-            center_b = self.vertex_list[edge[1]]
-            line_segment = LineSegment(center_a, center_b)
-            def FindEdgeSegment(polygon):
-                for edge_segment in polygon.GenerateLineSegments():
-                    point = edge_segment.IntersectWith(line_segment)
-                    if point is not None:
-                        return edge_segment
-                else:
-                    raise Exception('Failed to find line quad end.')
-            polygon_a = polygon_list[edge[0]]
-            polygon_b = polygon_list[edge[1]]
-            edge_segment_a = FindEdgeSegment(polygon_a)
-            edge_segment_b = FindEdgeSegment(polygon_b)
-            triangle_a = Triangle(edge_segment_a.point_a, edge_segment_b.point_b, edge_segment_b.point_a)
-            triangle_b = Triangle(edge_segment_a.point_a, edge_segment_b.point_a, edge_segment_a.point_b)
-            area_a = triangle_a.Area()
-            area_b = triangle_b.Area()
-            if area_a < 0.0 or area_b < 0.0:
-                raise Exception('Miscalculated line quad triangles.')
-            mesh.AddTriangle(triangle_a)
-            mesh.AddTriangle(triangle_b)
+        mesh.vertex_list = point_array.ToVectors()
+        mesh.triangle_list = [tuple(triple) for triple in triangle_array.tolist()]
         return mesh
 
     def Reduce(self, epsilon=1e-7):
         # Here we're removing all vertices of degree 2 where the incident
-        # edges are approximately co-linear.
-        keep_going = True
-        while keep_going:
-            keep_going = False
-            for i in range(len(self.vertex_list)):
-                adjacency_list = self.FindAllAdjacencies(i, ignore_direction=True, vertices=False)
-                if len(adjacency_list) == 2:
-                    edge_a = adjacency_list[0]
-                    edge_b = adjacency_list[1]
-                    point_a = self.vertex_list[edge_a[0]] if edge_a[0] != i else self.vertex_list[edge_a[1]]
-                    point_b = self.vertex_list[edge_b[0]] if edge_b[0] != i else self.vertex_list[edge_b[1]]
-                    line_seg = LineSegment(point_a=point_a, point_b=point_b)
-                    distance = line_seg.Distance(self.vertex_list[i])
-                    if distance < epsilon:
-                        self.RemoveVertex(i)
-                        self.Add(line_seg, disposition={}, epsilon=epsilon)
-                        keep_going = True
-                        break
\ No newline at end of file
+        # edges are approximately co-linear.  Rather than rescan the whole graph
+        # after each removal, we keep a work-list of vertices worth looking at,
+        # which starts out as all of them.  Once we find a removable vertex, we
+        # keep walking the run of vertices it's on in both directions, removing
+        # vertices for as long as they lie on the segment spanning what's been
+        # removed, so that a whole run is replaced by a single edge.  Removed
+        # vertices and edges are merely marked dead as we go, and the indices
+        # are compacted once at the end.  Where all the edges of a run agree on
+        # label and direction, the edge replacing them keeps those.
+        vertex_list = self.vertex_list
+        edge_list = list(self.edge_list)
+        incident_list = [[] for i in range(len(vertex_list))]
+        for k, edge in enumerate(edge_list):
+            incident_list[edge[0]].append(k)
+            incident_list[edge[1]].append(k)
+        degree_list = [len(incident) for incident in incident_list]
+        removed_list = [False] * len(vertex_list)
+
+        def LiveEdges(i):
+            live_list = [k for k in incident_list[i] if edge_list[k] is not None]
+            incident_list[i] = live_list
+            return live_list
+
+        def Kill(k):
+            edge = edge_list[k]
+            degree_list[edge[0]] -= 1
+            degree_list[edge[1]] -= 1
+            edge_list[k] = None
+
+        def IsOnSegment(point, point_a, point_b):
+            dx = point_b.x - point_a.x
+            dy = point_b.y - point_a.y
+            length_squared = dx * dx + dy * dy
+            t = ((point.x - point_a.x) * dx + (point.y - point_a.y) * dy) / length_squared if length_squared > 0.0 else 0.0
+            if t < 0.0:
+                t = 0.0
+            elif t > 1.0:
+                t = 1.0
+            return math.hypot(point.x - point_a.x - t * dx, point.y - point_a.y - t * dy) < epsilon
+
+        work_list = [i for i in range(len(vertex_list) - 1, -1, -1) if degree_list[i] == 2]
+        while len(work_list) > 0:
+            i = work_list.pop()
+            if removed_list[i] or degree_list[i] != 2:
+                continue
+            live_list = LiveEdges(i)
+            edge_a = edge_list[live_list[0]]
+            edge_b = edge_list[live_list[1]]
+            a = edge_a[1] if edge_a[0] == i else edge_a[0]
+            b = edge_b[1] if edge_b[0] == i else edge_b[0]
+            if a == b or not IsOnSegment(vertex_list[i], vertex_list[a], vertex_list[b]):
+                continue
+            removed_list[i] = True
+            Kill(live_list[0])
+            Kill(live_list[1])
+            # Track whether the run flows from a to b (+1), from b to a (-1), or neither (0), and its label.
+            flow = 1 if edge_a[0] == a else -1
+            if (1 if edge_b[1] == b else -1) != flow:
+                flow = 0
+            label = edge_a[2] if edge_a[2] == edge_b[2] else None
+            for forward in [True, False]:
+                while True:
+                    end, other = (b, a) if forward else (a, b)
+                    if degree_list[end] != 1:
+                        break
+                    k = LiveEdges(end)[0]
+                    edge = edge_list[k]
+                    c = edge[1] if edge[0] == end else edge[0]
+                    if c == other or not IsOnSegment(vertex_list[end], vertex_list[other], vertex_list[c]):
+                        break
+                    removed_list[end] = True
+                    Kill(k)
+                    if (1 if (edge[0] == end) == forward else -1) != flow:
+                        flow = 0
+                    if edge[2] != label:
+                        label = None
+                    if forward:
+                        b = c
+                    else:
+                        a = c
+            # Like adding the line-segment from a to b would, we don't duplicate an edge already there.
+            if not any(b in edge_list[k][:2] for k in LiveEdges(a)):
+                if label is None or flow == 0:
+                    new_edge = (a, b, PlanarGraphEdgeLabel.NONE)
+                elif flow > 0:
+                    new_edge = (a, b, label)
+                else:
+                    new_edge = (b, a, label)
+                incident_list[a].append(len(edge_list))
+                incident_list[b].append(len(edge_list))
+                degree_list[a] += 1
+                degree_list[b] += 1
+                edge_list.append(new_edge)
+            work_list.append(b)
+            work_list.append(a)
+
+        # Now compact the vertex and edge lists.
+        index_list = [None] * len(vertex_list)
+        new_vertex_list = []
+        for i, vertex in enumerate(vertex_list):
+            if not removed_list[i]:
+                index_list[i] = len(new_vertex_list)
+                new_vertex_list.append(vertex)
+        self.vertex_list = new_vertex_list
+        self.edge_list = [(index_list[edge[0]], index_list[edge[1]], edge[2]) for edge in edge_list if edge is not None]
@@ -1,15 +1,23 @@
 # math2d_point_cloud.py
 
 import math
-import random
 
 from math2d_vector import Vector
-from math2d_line_segment import LineSegment
 from math2d_affine_transform import AffineTransform
+from math2d_vertex_index import VertexIndex
+from math2d_kd_tree import KDTree
 
 class PointCloud(object):
+    # Points are welded as they're added using a vertex index, and proximity queries go through a KD-tree.
+    # Both are kept in sync with the point list, but call Invalidate() after replacing a point in place.
     def __init__(self):
         self.point_list = []
+        self.point_index = VertexIndex()
+        self.point_tree = KDTree()
+    
+    def Invalidate(self):
+        self.point_index.Invalidate()
+        self.point_tree.Invalidate()
     
     def Size(self):
         return len(self.point_list)
@@ -22,12 +30,13 @@ class PointCloud(object):
             return False, None
         if self.Size() != point_cloud.Size():
             return False, None
+        # Match each of our points to the nearest point of the other cloud, each match costing O(log n).
         total_error = 0.0
         for point in self.point_list:
-            i = point_cloud.FindPoint(point, epsilon)
-            if i is None:
+            i, distance = point_cloud.Nearest(point)
+            if i is None or distance >= epsilon:
                 return False, None
-            total_error += (point - point_cloud.point_list[i]).Length()
+            total_error += distance
         return True, total_error
     
     def Add(self, other, epsilon=1e-7):
@@ -53,85 +62,39 @@ class PointCloud(object):
                 self.Add(vertex)
     
     def FindPoint(self, given_point, epsilon=1e-7):
-        # For large point-clouds, a linear search here may be impractical, and something like a BSP tree would be helpful.
-        for i, point in enumerate(self.point_list):
-            if given_point.IsPoint(point, epsilon):
-                return i
-        return None
+        return self.point_index.Sync(self.point_list).Find(given_point, epsilon)
     
     def FindNearestPoints(self, given_point, epsilon=1e-7):
-        nearest_points = []
-        smallest_distance = 999999.0
-        for i, point in enumerate(self.point_list):
-            distance = (point - given_point).Length()
-            if math.fabs(distance - smallest_distance) < epsilon:
-                nearest_points.append(i)
-            elif distance < smallest_distance:
-                nearest_points = []
-                smallest_distance = distance
+        # Return the indices of all points tied, to within epsilon, for nearest to the given point, along with
+        # the smallest distance.  If there are no points, we return an empty list and a distance of None.
+        i, smallest_distance = self.Nearest(given_point)
+        if i is None:
+            return [], None
+        nearest_points = [j for j in self.WithinRadius(given_point, smallest_distance + epsilon)
+                          if math.fabs((self.point_list[j] - given_point).Length() - smallest_distance) < epsilon]
         return nearest_points, smallest_distance
+
+    def Nearest(self, given_point):
+        # Return the index of the point nearest the given point, and its distance, or (None, None) if there are no points.
+        return self.point_tree.Sync(self.point_list).Nearest(given_point)
+
+    def KNearest(self, given_point, k):
+        # Return up to k (index, distance) pairs for the points nearest the given point, nearest first.
+        return self.point_tree.Sync(self.point_list).KNearest(given_point, k)
+
+    def WithinRadius(self, given_point, radius):
+        # Return, in increasing order, the indices of all points within the given distance of the given point.
+        return self.point_tree.Sync(self.point_list).WithinRadius(given_point, radius)
     
-    def GenerateConvexHull(self):
-        from math2d_line import Line
+    def GenerateConvexHull(self, epsilon=1e-7):
+        # Return the convex hull of the cloud as a CCW polygon made of the cloud's own points.
         from math2d_polygon import Polygon
-        from math2d_triangle import Triangle
-        found = False
-        for i in range(len(self.point_list)):
-            for j in range(len(self.point_list)):
-                if j == i:
-                    continue
-                for k in range(len(self.point_list)):
-                    if k == i or k == j:
-                        continue
-                    triangle = Triangle(self.point_list[i], self.point_list[j], self.point_list[k])
-                    if triangle.Area() > 0.0:
-                        found = True
-                        break
-                if found:
-                    break
-            if found:
-                break
-        if not found:
+        from math2d_convex_hull import ConvexHull
+        index_list = ConvexHull(epsilon).GenerateIndices(self.point_list)
+        if len(index_list) < 3:
             raise Exception('Failed to find initial triangle.')
         polygon = Polygon()
-        polygon.vertex_list = [triangle.vertex_a, triangle.vertex_b, triangle.vertex_c]
-        point_list = [point for point in self.point_list]
-        random.seed(0)
-        while True:
-            new_point_list = []
-            for point in point_list:
-                if not polygon.ContainsPoint(point, assume_convex=True):
-                    new_point_list.append(point)
-            point_list = new_point_list
-            if len(point_list) == 0:
-                break
-            # Perhaps randomly choosing a point will help us terminate quicker on average?
-            point = random.choice(point_list)
-            point_cloud = PointCloud()
-            point_cloud.Add(polygon)
-            j = None
-            k = None
-            for i in range(len(polygon.vertex_list)):
-                vertex = polygon.vertex_list[i]
-                line = Line()
-                line.MakeForPoints(point, vertex)
-                point_cloud_back, point_cloud_front, point_cloud_neither = point_cloud.Split(line)
-                if point_cloud_front.Size() == 0:
-                    j = i
-                if point_cloud_back.Size() == 0:
-                    k = i
-                if j is not None and k is not None and j != k:
-                    break
-            else:
-                raise Exception('Failed to determine how to add point to convex hull.')
-            new_vertex_list = [point]
-            i = k
-            while True:
-                new_vertex_list.append(polygon.vertex_list[i])
-                if i == j:
-                    break
-                i = (i + 1) % len(polygon.vertex_list)
-            polygon.vertex_list = new_vertex_list
+        polygon.vertex_list = [self.point_list[i] for i in index_list]
         return polygon
 
     def Split(self, line, epsilon=1e-7):
@@ -149,35 +112,100 @@ class PointCloud(object):
                 point_cloud_neither.Add(point)
         return point_cloud_back, point_cloud_front, point_cloud_neither
 
-    def GenerateSymmetries(self):
+    def _GenerateRays(self, center, epsilon):
+        # Sort the points by angle about the given center, grouping those on the same ray from it, so that the cloud
+        # becomes a cyclic string of rays.  Each ray is its angle, the angle to the next ray CCW, and its radii in order.
+        # A point at the center is fixed by every symmetry about it, so we leave it out.
+        entry_list = []
+        for point in self.point_list:
+            vector = point - center
+            radius = vector.Length()
+            if radius > epsilon:
+                entry_list.append((vector.Heading(), radius))
+        entry_list.sort()
+        ray_list = []
+        for angle, radius in entry_list:
+            if len(ray_list) > 0 and (angle - ray_list[-1][0]) * max(radius, ray_list[-1][2][-1]) <= epsilon:
+                ray_list[-1][2].append(radius)
+            else:
+                ray_list.append([angle, 0.0, [radius]])
+        if len(ray_list) > 1 and (ray_list[0][0] + 2.0 * math.pi - ray_list[-1][0]) * max(ray_list[0][2][-1], ray_list[-1][2][-1]) <= epsilon:
+            ray_list[-1][2] += ray_list.pop(0)[2]
+        for i, ray in enumerate(ray_list):
+            ray[2].sort()
+            next_angle = ray_list[(i + 1) % len(ray_list)][0]
+            ray[1] = math.fmod(next_angle - ray[0] + 4.0 * math.pi, 2.0 * math.pi) if len(ray_list) > 1 else 2.0 * math.pi
+        return ray_list
+
+    @staticmethod
+    def _FindCyclicMatches(pattern_list, text_list):
+        # Return each i for which the given pattern equals the given text read cyclically from its i-th item.  This
+        # is Knuth-Morris-Pratt, run over the text twice around, so it takes time linear in the length of the text.
+        # It relies on equality being transitive, which is why we match keys here rather than compare within epsilon.
+        size = len(pattern_list)
+        failure_list = [0] * size
+        k = 0
+        for i in range(1, size):
+            while k > 0 and pattern_list[i] != pattern_list[k]:
+                k = failure_list[k - 1]
+            if pattern_list[i] == pattern_list[k]:
+                k += 1
+            failure_list[i] = k
+        match_list = []
+        k = 0
+        for i in range(2 * size - 1):
+            item = text_list[i % size]
+            while k > 0 and item != pattern_list[k]:
+                k = failure_list[k - 1]
+            if item == pattern_list[k]:
+                k += 1
+            if k == size:
+                match_list.append(i - size + 1)
+                k = failure_list[k - 1]
+        return match_list
+
+    def GenerateSymmetries(self, epsilon=1e-7):
+        # Every symmetry of the cloud fixes its average point, so we read the cloud as a cyclic string of rays about
+        # that point.  A rotational symmetry shifts this string onto itself, and a reflective symmetry maps it onto
+        # itself read backwards, so we can find them all by string matching in O(n log n) time.  For the matching,
+        # each ray is snapped to a key on a grid of cell size 2 epsilon, and keys must be equal, so rays that
+        # differ by less than epsilon can still land in neighboring cells.  A symmetry that holds only to within
+        # epsilon may therefore be missed.  Keys can also agree for rays that differ by a little more than epsilon,
+        # so each symmetry found this way is confirmed before we return it.
         reflection_list = []
-        center_reflection_list = []
         center = self.AveragePoint()
-        for i in range(len(self.point_list)):
-            for j in range(i + 1, len(self.point_list)):
-                line_segment = LineSegment(self.point_list[i], self.point_list[j])
-                mid_point = line_segment.Lerp(0.5)
-                normal = line_segment.Direction().Normalized().RotatedCCW90()
-                reflection = AffineTransform()
-                reflection.Reflection(mid_point, normal)
-                center_reflected = reflection.Transform(center)
-                if center_reflected.IsPoint(center):
-                    center_reflection_list.append({'reflection': reflection, 'normal': normal})
-                is_symmetry, total_error = self.IsSymmetry(reflection)
-                if is_symmetry:
-                    new_entry = {'reflection': reflection, 'total_error': total_error, 'center': mid_point, 'normal': normal}
-                    for k, entry in enumerate(reflection_list):
-                        if entry['reflection'].IsTransform(reflection):
-                            if entry['total_error'] > total_error:
-                                reflection_list[k] = new_entry
-                            break
-                    else:
-                        reflection_list.append(new_entry)
+        if center is None:
+            return reflection_list, None, None
+        ray_list = self._GenerateRays(center, epsilon)
+        if len(ray_list) == 0:
+            return reflection_list, None, None
+
+        # The angle to the next ray is measured as arc length at the outermost radius of the cloud.
+        cell_size = 2.0 * epsilon
+        max_radius = max([ray[2][-1] for ray in ray_list])
+        def Key(angle, radius_list):
+            return (int(round(angle * max_radius / cell_size)), tuple([int(round(radius / cell_size)) for radius in radius_list]))
+
+        # Read backwards, each ray is followed by the one before it, so it takes on the angle from that one.
+        size = len(ray_list)
+        key_list = [Key(ray[1], ray[2]) for ray in ray_list]
+        reversed_key_list = [Key(ray_list[i - 1][1], ray_list[i][2]) for i in range(size - 1, -1, -1)]
+        for i in self._FindCyclicMatches(reversed_key_list, key_list):
+            # Here the last ray maps to the i-th, so the axis of reflection is half-way between them.
+            axis_angle = math.fmod((ray_list[-1][0] + ray_list[i][0]) / 2.0 + 2.0 * math.pi, math.pi)
+            if size <= 2 and all([math.fabs(math.sin(ray[0] - axis_angle)) * ray[2][-1] <= epsilon for ray in ray_list]):
+                # Every point is on this axis, so it doesn't reflect any point to any other.  We don't count this.
+                continue
+            normal = Vector(math.cos(axis_angle), math.sin(axis_angle))
+            reflection = AffineTransform()
+            reflection.Reflection(center, normal)
+            is_symmetry, total_error = self.IsSymmetry(reflection, epsilon)
+            if is_symmetry:
+                reflection_list.append({'reflection': reflection, 'total_error': total_error, 'center': center, 'normal': normal})
         
         # Rotations are just double-reflections.  We return here a CCW rotational symmetry that generates
         # the sub-group of rotational symmetries of the overall group of symmetries of the cloud.  We also
         # return its inverse for convenience.  Of course, not all point clouds have any rotational symmetry.
-        epsilon = 1e-7
         def SortKey(entry):
             if entry['normal'].y <= -epsilon:
                 entry['normal'] = -entry['normal']
@@ -206,37 +234,20 @@ class PointCloud(object):
             # Note that the identity transform is not considered a symmetry.
             pass
         else:
-            # If we found no reflective symmetry, the cloud may still have rotational symmetry.
-            # Furthermore, if it does, it must rotate about the average point.  I think there is a way
-            # to prove this using strong induction.  Note that the statement holds for all point-clouds
-            # made from vertices taken from regular polygons.  Now for any given point-cloud with any
-            # given rotational symmetry, consider 1 point of that cloud.  Removing that point along
-            # with the minimum number of other points necessary to keep the given rotational symmetry,
-            # we must remove points making up a regular polygon's vertices.  By inductive hypothesis,
-            # the remaining cloud has its average point at the center of the rotational symmetry.  Now
-            # see that adding the removed points back does not change the average point of the cloud.
-            # Is it true that every line of symmetry of the cloud contains the average point?  I believe
-            # the answer is yes.  Take any point-cloud with a reflective symmetry and consider all but
-            # 2 of its points that reflect into one another along that symmetry.  If the cloud were just
-            # these 2 points, then the average point is on the line of symmetry.  Now notice that as you
-            # add back points by pairs, each pair reflecting into one another, the average point of the
-            # cloud remains on the line of symmetry.
-            center_reflection_list.sort(key=SortKey)
-            found = False
-            for i in range(len(center_reflection_list)):
-                for j in range(i + 1, len(center_reflection_list)):
-                    ccw_rotation = center_reflection_list[i]['reflection'] * center_reflection_list[j]['reflection']
-                    is_symmetry, total_error = self.IsSymmetry(ccw_rotation)
-                    if is_symmetry:
-                        # By stopping at the first one we find, we should be minimizing the angle of rotation.
-                        found = True
-                        break
-                if found:
+            # If we found no reflective symmetry, the cloud may still have rotational symmetry.  The smallest
+            # shift of the string of rays onto itself gives the smallest angle of rotation, and we make the
+            # rotation out of two reflections through the center, half that angle apart, as we do above.
+            for i in self._FindCyclicMatches(key_list, key_list)[1:]:
+                angle = ray_list[i][0] - ray_list[0][0]
+                reflection_a = AffineTransform()
+                reflection_a.Reflection(center, Vector(1.0, 0.0))
+                reflection_b = AffineTransform()
+                reflection_b.Reflection(center, Vector(math.cos(angle / 2.0), math.sin(angle / 2.0)))
+                is_symmetry, total_error = self.IsSymmetry(reflection_a * reflection_b, epsilon)
+                if is_symmetry:
+                    ccw_rotation = reflection_a * reflection_b
+                    cw_rotation = reflection_b * reflection_a
                     break
-            if found:
-                cw_rotation = ccw_rotation.Inverted()
-            else:
-                ccw_rotation = None
         
         return reflection_list, ccw_rotation, cw_rotation
     
@@ -0,0 +1,265 @@
+# math2d_point_locator.py
+
+import math
+import bisect
+
+class PointLocator(object):
+    # This is a build-once point-location structure over the edges of a region, using slab decomposition.
+    # The plane is cut into vertical slabs at every distinct vertex x-coordinate.  No edge crosses another
+    # within a slab, so the edges spanning each slab can be sorted bottom to top once and for all, along
+    # with whether the region lies above each one.  A query is then a binary search for the slab followed
+    # by a binary search within the slab, which is O(log n).  Each edge remembers its sub-region and whether
+    # it belongs to a hole, which is what we need to agree with Region.ContainsPoint about border points.
+    # Storage is the total number of edges over all slabs, which is O(n) for typical regions, but can be
+    # as bad as O(n^2).  The locator does not track changes to the region; see Region.Locator() for that.
+    OUTSIDE = 0
+    INSIDE = 1
+    BORDER = 2
+
+    def __init__(self, region=None, epsilon=1e-7):
+        self.epsilon = epsilon
+        self.region = None
+        self.edge_list = []
+        self.vertical_list = []
+        self.vertical_x_list = []
+        self.slab_x_list = []
+        self.slab_list = []
+        self.reach = epsilon
+        self.array_map = None
+        if region is not None:
+            self.Build(region)
+
+    def Build(self, region):
+        self.region = region
+        self.edge_list = []
+        self.vertical_list = []
+        for k, sub_region in enumerate(region.sub_region_list):
+            # Hole edges are reversed so that the inside of the region is always on the left.
+            self._AddRing(sub_region.polygon.vertex_list, k, False)
+            for hole in sub_region.hole_list:
+                self._AddRing(hole.vertex_list[::-1], k, True)
+        self.vertical_list.sort()
+        self.vertical_x_list = sorted(set([edge[0] for edge in self.vertical_list]))
+        # A border point may lie past the end of an edge by epsilon times the edge's length, so this is how far
+        # in x we may have to look for the edges a point is on.
+        length_list = [math.hypot(edge[2] - edge[0], edge[3] - edge[1]) for edge in self.edge_list]
+        length_list += [edge[2] - edge[1] for edge in self.vertical_list]
+        self.reach = self.epsilon * (1.0 + max(length_list + [0.0]))
+        self.slab_x_list = sorted(set([edge[0] for edge in self.edge_list] + [edge[2] for edge in self.edge_list]))
+        # Sweep across the slabs, keeping the set of edges spanning the current one.
+        start_list = sorted(range(len(self.edge_list)), key=lambda i: self.edge_list[i][0])
+        active_set = set()
+        j = 0
+        self.slab_list = []
+        for i in range(len(self.slab_x_list) - 1):
+            x_min = self.slab_x_list[i]
+            x_max = self.slab_x_list[i + 1]
+            while j < len(start_list) and self.edge_list[start_list[j]][0] <= x_min:
+                active_set.add(start_list[j])
+                j += 1
+            active_set = set([e for e in active_set if self.edge_list[e][2] >= x_max])
+            x_mid = (x_min + x_max) / 2.0
+            slab = sorted(active_set, key=lambda e: self._EdgeY(e, x_mid))
+            # For each edge of the slab, record whether we're in the region just above it.
+            inside_list = []
+            count = 0
+            for e in slab:
+                count += self.edge_list[e][4]
+                inside_list.append(count > 0)
+            self.slab_list.append((slab, inside_list))
+        self.array_map = None
+        return self
+
+    def _AddRing(self, vertex_list, sub_region_index, is_hole):
+        for i in range(len(vertex_list)):
+            point_a = vertex_list[i]
+            point_b = vertex_list[(i + 1) % len(vertex_list)]
+            if point_a.x == point_b.x:
+                if point_a.y != point_b.y:
+                    self.vertical_list.append((point_a.x, min(point_a.y, point_b.y), max(point_a.y, point_b.y), sub_region_index, is_hole))
+            elif point_a.x < point_b.x:
+                # Going right, the inside is on our left, which is above us.
+                self.edge_list.append((point_a.x, point_a.y, point_b.x, point_b.y, 1, sub_region_index, is_hole))
+            else:
+                self.edge_list.append((point_b.x, point_b.y, point_a.x, point_a.y, -1, sub_region_index, is_hole))
+
+    def _EdgeY(self, e, x):
+        edge = self.edge_list[e]
+        return edge[1] + (x - edge[0]) * (edge[3] - edge[1]) / (edge[2] - edge[0])
+
+    def _IsOnEdge(self, e, point):
+        # This is the same test as Polygon.ContainsPointOnBorder makes of each edge.
+        edge = self.edge_list[e]
+        eps = self.epsilon
+        ax = edge[2] - edge[0]
+        ay = edge[3] - edge[1]
+        bx = point.x - edge[0]
+        by = point.y - edge[1]
+        length_squared = ax * ax + ay * ay
+        cross = ax * by - ay * bx
+        if cross * cross >= eps * eps * length_squared:
+            return False
+        lerp_value = (ax * bx + ay * by) / length_squared
+        return -eps < lerp_value < 1.0 + eps
+
+    def _SearchSlab(self, i, point):
+        # Return the number of edges of the given slab at or below the given point.
+        slab = self.slab_list[i][0]
+        lo = 0
+        hi = len(slab)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._EdgeY(slab[mid], point.x) <= point.y:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _FindBorderEdges(self, point):
+        # Return the edges the given point is on, as (sub-region index, is-hole) pairs.  Within a slab, an
+        # edge can't be nearer than the edges just above and below the point, unless the point is near the
+        # side of the slab, so we look at those two edges of each slab within reach of the point.
+        border_list = []
+        eps = self.epsilon
+        reach = self.reach
+        lo = max(bisect.bisect_right(self.slab_x_list, point.x - reach) - 1, 0)
+        hi = min(bisect.bisect_left(self.slab_x_list, point.x + reach), len(self.slab_list))
+        for i in range(lo, hi):
+            slab = self.slab_list[i][0]
+            k = self._SearchSlab(i, point)
+            for e in slab[max(k - 1, 0):k + 1]:
+                if self._IsOnEdge(e, point):
+                    edge = self.edge_list[e]
+                    border_list.append((edge[5], edge[6]))
+        # Vertical edges at the same x don't overlap, so sorted by their bottoms, they're also sorted by their tops.
+        # We can therefore stop looking down the edges at each x once we reach one that tops out below the point.
+        lo = bisect.bisect_right(self.vertical_x_list, point.x - eps)
+        for x in self.vertical_x_list[lo:]:
+            if x >= point.x + eps:
+                break
+            k = bisect.bisect_right(self.vertical_list, (x, point.y + reach, math.inf))
+            while k > 0:
+                k -= 1
+                edge = self.vertical_list[k]
+                if edge[0] != x or edge[2] < point.y - reach:
+                    break
+                margin = eps * (edge[2] - edge[1])
+                if edge[1] - margin < point.y < edge[2] + margin:
+                    border_list.append((edge[3], edge[4]))
+        return border_list
+
+    def _IsInside(self, point):
+        i = bisect.bisect_right(self.slab_x_list, point.x) - 1
+        if i < 0 or i >= len(self.slab_list):
+            return False
+        k = self._SearchSlab(i, point)
+        return k > 0 and self.slab_list[i][1][k - 1]
+
+    def Locate(self, point):
+        if len(self._FindBorderEdges(point)) > 0:
+            return self.BORDER
+        return self.INSIDE if self._IsInside(point) else self.OUTSIDE
+
+    def ContainsPoint(self, point):
+        # This agrees with Region.ContainsPoint: border points are contained unless they are on the border of a hole.
+        border_list = self._FindBorderEdges(point)
+        if len(border_list) == 0:
+            return self._IsInside(point)
+        # Border points are rare, so we just ask the sub-regions involved.
+        for k in set([pair[0] for pair in border_list]):
+            if self.region.sub_region_list[k].ContainsPoint(point, self.epsilon):
+                return True
+        return False
+
+    def _Arrays(self):
+        # Flatten the slabs into arrays for the bulk queries.
+        import numpy
+        if self.array_map is None:
+            offset_list = [0]
+            entry_list = []
+            inside_list = []
+            for slab, slab_inside_list in self.slab_list:
+                entry_list += slab
+                inside_list += slab_inside_list
+                offset_list.append(len(entry_list))
+            edge_array = numpy.array([self.edge_list[e][:4] for e in entry_list], dtype=numpy.float64).reshape(-1, 4)
+            self.array_map = {
+                'slab_x': numpy.array(self.slab_x_list, dtype=numpy.float64),
+                'offset': numpy.array(offset_list, dtype=numpy.int64),
+                'x0': edge_array[:, 0].copy(),
+                'y0': edge_array[:, 1].copy(),
+                'x1': edge_array[:, 2].copy(),
+                'y1': edge_array[:, 3].copy(),
+                'inside': numpy.array(inside_list, dtype=bool)
+            }
+        return self.array_map
+
+    def LocatePoints(self, point_array):
+        # This is a batch version of Locate, taking a VectorArray, or a list of vectors, and returning an array
+        # of location codes.  Both binary searches run for all the points at once.  Points within reach of
+        # the side of a slab are the only ones that need more care, and those we hand off to Locate().
+        import numpy
+        from math2d_vector_array import VectorArray
+        if not isinstance(point_array, VectorArray):
+            point_array = VectorArray().FromVectors(point_array)
+        array_map = self._Arrays()
+        x = point_array.x
+        y = point_array.y
+        eps = self.epsilon
+        result = numpy.full(len(x), self.OUTSIDE, dtype=numpy.int64)
+        slab_x = array_map['slab_x']
+        if len(slab_x) < 2:
+            slow_mask = numpy.ones(len(x), dtype=bool)
+        else:
+            i = numpy.searchsorted(slab_x, x, side='right') - 1
+            in_range = (i >= 0) & (i < len(slab_x) - 1)
+            i = numpy.clip(i, 0, len(slab_x) - 2)
+            lo = array_map['offset'][i]
+            hi = array_map['offset'][i + 1]
+            start = lo.copy()
+            end = hi.copy()
+            x0, y0, x1, y1 = array_map['x0'], array_map['y0'], array_map['x1'], array_map['y1']
+            while True:
+                active = lo < hi
+                if not active.any():
+                    break
+                mid = (lo + hi) // 2
+                e = numpy.where(active, mid, 0)
+                edge_y = y0[e] + (x - x0[e]) * (y1[e] - y0[e]) / (x1[e] - x0[e])
+                below = active & (edge_y <= y)
+                lo = numpy.where(below, mid + 1, lo)
+                hi = numpy.where(active & ~below, mid, hi)
+            has_below = in_range & (lo > start)
+            inside = numpy.zeros(len(x), dtype=bool)
+            inside[has_below] = array_map['inside'][lo[has_below] - 1]
+            result[inside] = self.INSIDE
+            # Check the edges just below and above each point for the border.
+            on_border = numpy.zeros(len(x), dtype=bool)
+            for k, valid in [(lo - 1, has_below), (lo, in_range & (lo < end))]:
+                e = numpy.where(valid, k, 0)
+                ax = x1[e] - x0[e]
+                ay = y1[e] - y0[e]
+                bx = x - x0[e]
+                by = y - y0[e]
+                length_squared = ax * ax + ay * ay
+                cross = ax * by - ay * bx
+                lerp_value = (ax * bx + ay * by) / length_squared
+                on_border |= valid & (cross * cross < eps * eps * length_squared) & (-eps < lerp_value) & (lerp_value < 1.0 + eps)
+            result[on_border] = self.BORDER
+            near_side = numpy.fabs(x - slab_x[i]) <= self.reach
+            near_side |= numpy.fabs(x - slab_x[i + 1]) <= self.reach
+            slow_mask = near_side | ~in_range
+        for j in numpy.nonzero(slow_mask)[0]:
+            result[j] = self.Locate(point_array[int(j)])
+        return result
+
+    def ContainsPoints(self, point_array):
+        # This is a batch version of ContainsPoint, returning an array of booleans.
+        from math2d_vector_array import VectorArray
+        if not isinstance(point_array, VectorArray):
+            point_array = VectorArray().FromVectors(point_array)
+        location = self.LocatePoints(point_array)
+        contained = location == self.INSIDE
+        for j in (location == self.BORDER).nonzero()[0]:
+            contained[j] = self.ContainsPoint(point_array[int(j)])
+        return contained
@@ -6,14 +6,21 @@ import math
 from math2d_vector import Vector
 from math2d_triangle import Triangle
 from math2d_line_segment import LineSegment
+from math2d_vertex_index import VertexIndex
 
 class Polygon(object):
     # These are lists of points with CCW winding in the plane.
     # The path of the polygon's perimeter must not cross itself, but we do allow polygons to be self-tangential.
     # If the vertex list does not satisfy these requirements, then the result of any method is left undefined.
+    # Properties like area and winding are cached, and the cache notices when the vertex list is replaced,
+    # grown or shrunk.  Replacing a vertex in place goes unnoticed, so do that and then call Invalidate().
     def __init__(self):
         self.vertex_list = []
         self.mesh = None
+        self.vertex_index = VertexIndex()
+        self.property_map = None
+        self.property_list = None
+        self.property_last = None
     
     def Copy(self):
         return copy.deepcopy(self)
@@ -28,11 +35,67 @@ class Polygon(object):
         self.vertex_list = [Vector().Deserialize(vertex) for vertex in json_data.get('vertex_list', [])]
         return self
 
+    def Invalidate(self):
+        self.vertex_index.Invalidate()
+        self.property_map = None
+
+    def _Properties(self):
+        vertex_list = self.vertex_list
+        count = len(vertex_list)
+        if self.property_map is not None and self.property_list is vertex_list and self.property_map['count'] == count:
+            if count == 0 or vertex_list[-1] is self.property_last:
+                return self.property_map
+        # One pass gets us everything.  The turn at each vertex tells us about convexity, and the
+        # shoelace formula, with its terms weighted by edge midpoints, gives us area and centroid.
+        # The shoelace terms are taken about the first vertex, rather than the origin, so that they
+        # don't cancel catastrophically for small polygons far from the origin.
+        origin_x = vertex_list[0].x if count > 0 else 0.0
+        origin_y = vertex_list[0].y if count > 0 else 0.0
+        double_area = 0.0
+        centroid_x = 0.0
+        centroid_y = 0.0
+        min_x = min_y = float('inf')
+        max_x = max_y = float('-inf')
+        left_turns = 0
+        right_turns = 0
+        for i in range(count):
+            vertex_a = vertex_list[i - 1]
+            vertex_b = vertex_list[i]
+            vertex_c = vertex_list[(i + 1) % count]
+            ax = vertex_a.x - origin_x
+            ay = vertex_a.y - origin_y
+            bx = vertex_b.x - origin_x
+            by = vertex_b.y - origin_y
+            cross = ax * by - bx * ay
+            double_area += cross
+            centroid_x += (ax + bx) * cross
+            centroid_y += (ay + by) * cross
+            min_x = min(min_x, vertex_b.x)
+            max_x = max(max_x, vertex_b.x)
+            min_y = min(min_y, vertex_b.y)
+            max_y = max(max_y, vertex_b.y)
+            turn = (vertex_b.x - vertex_a.x) * (vertex_c.y - vertex_b.y) - (vertex_b.y - vertex_a.y) * (vertex_c.x - vertex_b.x)
+            if turn > 1e-7:
+                left_turns += 1
+            elif turn < -1e-7:
+                right_turns += 1
+        self.property_map = {
+            'count': count,
+            'signed_area': double_area / 2.0,
+            'centroid': Vector(origin_x + centroid_x / (3.0 * double_area), origin_y + centroid_y / (3.0 * double_area)) if double_area != 0.0 else None,
+            'min_point': Vector(min_x, min_y) if count > 0 else None,
+            'max_point': Vector(max_x, max_y) if count > 0 else None,
+            'convex': left_turns == 0 or right_turns == 0
+        }
+        self.property_list = vertex_list
+        self.property_last = vertex_list[-1] if count > 0 else None
+        return self.property_map
+
     def AverageVertex(self):
         avg_vertex = Vector(0.0, 0.0)
         for vertex in self.vertex_list:
             avg_vertex += vertex
-        avg_vertex = avg_vertex / float(len(self.vertex_list))
+        avg_vertex /= float(len(self.vertex_list))
         return avg_vertex
 
     def MakeRegularPolygon(self, sides, radius=1.0, center=None):
@@ -50,34 +113,10 @@ class Polygon(object):
         self._TessellateFast(self.mesh)
 
     def _TessellateFast(self, given_mesh):
-        # Hmmm...this is fast, but it does not correctly tessellate in some cases.
-        vertex_list_copy = self.vertex_list[:]
-        while len(vertex_list_copy) >= 3:
-            candidate_list = []
-            for i in range(len(vertex_list_copy)):
-                j = (i + 1) % len(vertex_list_copy)
-                k = (i + 2) % len(vertex_list_copy)
-                triangle = Triangle(vertex_list_copy[i], vertex_list_copy[j], vertex_list_copy[k])
-                area = triangle.Area()
-                if area >= 0.0:
-                    candidate_list.append((i, area))
-            if len(candidate_list) == 0:
-                raise Exception()
-            candidate_list.sort(key=lambda pair: pair[1], reverse=True)
-            found = False
-            for pair in candidate_list:
-                i = pair[0]
-                j = (i + 1) % len(vertex_list_copy)
-                k = (i + 2) % len(vertex_list_copy)
-                triangle = Triangle(vertex_list_copy[i], vertex_list_copy[j], vertex_list_copy[k])
-                # TODO: Here we need to vet the triangle.  Does a vertex go inside of it?  Does the polygon clip an edge of the polygon?  Etc.
-                #       If the triangle does not pass criteria, then go to the next candidate.
-                given_mesh.AddTriangle(triangle)
-                found = True
-                del vertex_list_copy[j]
-                break
-            if not found:
-                raise Exception()
+        # Unlike _Tessellate, this leaves our vertex list alone and never falls back to the slow algorithm.
+        ring_list = self._ClipEars(given_mesh)
+        if len(ring_list) > 0:
+            raise Exception('Failed to tessellate polygon!')
 
     def Tessellate(self):
         # Note that it is up to the caller to know when and if we need to recalculate this mesh, which some methods depend upon.
@@ -86,6 +125,27 @@ class Polygon(object):
         self._Tessellate(self.mesh)
     
     def _Tessellate(self, given_mesh):
+        self.RemoveRedundantVertices()
+        ring_list = self._ClipEars(given_mesh)
+        if len(ring_list) > 0:
+            # Ear clipping only gets stuck on polygons that break our rules, but the old algorithm
+            # sometimes still finds something reasonable for those, so give it what is left over.
+            polygon = Polygon()
+            polygon.vertex_list = [self.vertex_list[i] for i in ring_list]
+            polygon._TessellateBruteForce(given_mesh)
+
+    def _ClipEars(self, given_mesh):
+        # Add the triangles found by ear clipping to the given mesh, returning the indices of
+        # whatever part of the polygon could not be clipped, if any.
+        from math2d_triangulator import EarClipper
+        if len(self.vertex_list) < 3:
+            return []
+        triple_list, ring_list = EarClipper(self.vertex_list).Triangulate()
+        given_mesh.AddTriangleTriples(self.vertex_list, triple_list)
+        return ring_list
+
+    def _TessellateBruteForce(self, given_mesh):
+        # This is the original algorithm.  It tries every diagonal, so it is far too slow for large polygons.
         self.RemoveRedundantVertices()
         if len(self.vertex_list) < 3:
             return
@@ -138,8 +198,8 @@ class Polygon(object):
                 except:
                     pass
                 else:
-                    polygon_a._Tessellate(given_mesh)
-                    polygon_b._Tessellate(given_mesh)
+                    polygon_a._TessellateBruteForce(given_mesh)
+                    polygon_b._TessellateBruteForce(given_mesh)
                     break
             else:
                 raise Exception('Failed to tessellate polygon!')
@@ -148,14 +208,8 @@ class Polygon(object):
         return not self.IsConcave()
     
     def IsConcave(self):
-        from math2d_point_cloud import PointCloud
-        point_cloud = PointCloud()
-        point_cloud.Add(self)
-        for line in self.GenerateLines():
-            point_cloud_back, point_cloud_front, point_cloud_neither = point_cloud.Split(line)
-            if point_cloud_back.Size() > 0 and point_cloud_front.Size() > 0:
-                return True
-        return False
+        # A polygon whose path never crosses itself is convex if and only if it never turns both ways.
+        return not self._Properties()['convex']
     
     def RemoveRedundantVertices(self, epsilon=1e-7):
         if len(self.vertex_list) >= 3:
@@ -167,8 +221,9 @@ class Polygon(object):
                     vertex_a = self.vertex_list[i]
                     vertex_b = self.vertex_list[j]
                     vertex_c = self.vertex_list[k]
+                    # The middle vertex is redundant if it is within epsilon of the line through its neighbors.
                     triangle = Triangle(vertex_a, vertex_b, vertex_c)
-                    if math.fabs(triangle.Area()) <= epsilon:
+                    if 2.0 * math.fabs(triangle.Area()) <= epsilon * (vertex_c - vertex_a).Length():
                         found = j
                         break
                 if found is None:
@@ -176,8 +231,26 @@ class Polygon(object):
                 else:
                     del self.vertex_list[found]
     
+    def SignedArea(self):
+        # This is positive for CCW polygons, and negative for CW polygons.
+        return self._Properties()['signed_area']
+
     def Area(self):
-        return self.mesh.Area()
+        return math.fabs(self.SignedArea())
+
+    def Centroid(self):
+        # This is the center of mass of the polygon, as opposed to AverageVertex(), which depends on how the perimeter is sampled.
+        centroid = self._Properties()['centroid']
+        if centroid is None:
+            return self.AverageVertex() if len(self.vertex_list) > 0 else None
+        return centroid.Copy()
+
+    def BoundingBox(self):
+        from math2d_aa_rect import AxisAlignedRectangle
+        property_map = self._Properties()
+        if property_map['min_point'] is None:
+            return None
+        return AxisAlignedRectangle(property_map['min_point'].Copy(), property_map['max_point'].Copy())
     
     def ContainsPoint(self, point, epsilon=1e-7, assume_convex=False):
         if assume_convex:
@@ -187,17 +260,112 @@ class Polygon(object):
                 if side == Line.SIDE_FRONT:
                     return False
             return True
-        elif self.mesh is not None:
-            return self.mesh.ContainsPoint(point, epsilon)
-        else:
-            raise Exception('Can\'t determine if polygon contains point.')
+        # Points on the border are contained, and everything else is decided by winding number.
+        # Unlike a simple even-odd test, this also does the right thing for self-tangential polygons.
+        if self.ContainsPointOnBorder(point, epsilon):
+            return True
+        return self.WindingNumber(point) != 0
+
+    def ContainsPoints(self, point_array, epsilon=1e-7):
+        # This is a batch version of ContainsPoint, taking a VectorArray, or a list of vectors, and returning
+        # an array of booleans.  The points are sorted by y so that each edge need only visit the slice of
+        # points within its own range of y, and each such visit handles all of those points at once.
+        import numpy
+        order, x, y = self._SortPoints(point_array)
+        winding = numpy.zeros(len(y), dtype=numpy.int64)
+        count = len(self.vertex_list)
+        for i in range(count):
+            point_a = self.vertex_list[i]
+            point_b = self.vertex_list[(i + 1) % count]
+            if point_a.y < point_b.y:
+                lo, hi = numpy.searchsorted(y, (point_a.y, point_b.y), side='left')
+                side = (point_b.x - point_a.x) * (y[lo:hi] - point_a.y) - (point_b.y - point_a.y) * (x[lo:hi] - point_a.x)
+                winding[lo:hi] += side > 0.0
+            elif point_a.y > point_b.y:
+                lo, hi = numpy.searchsorted(y, (point_b.y, point_a.y), side='left')
+                side = (point_b.x - point_a.x) * (y[lo:hi] - point_a.y) - (point_b.y - point_a.y) * (x[lo:hi] - point_a.x)
+                winding[lo:hi] -= side < 0.0
+        contained = self._ContainsSortedPointsOnBorder(x, y, epsilon) | (winding != 0)
+        result = numpy.empty(len(y), dtype=bool)
+        result[order] = contained
+        return result
+
+    def _SortPoints(self, point_array):
+        import numpy
+        from math2d_vector_array import VectorArray
+        if not isinstance(point_array, VectorArray):
+            point_array = VectorArray().FromVectors(point_array)
+        order = numpy.argsort(point_array.y, kind='stable')
+        return order, point_array.x[order], point_array.y[order]
+
+    def WindingNumber(self, point):
+        # Count the signed crossings of the +x ray from the given point.  Upward edges count if the point is on their left,
+        # downward edges if the point is on their right, and each edge includes its lower end-point, but not its upper one.
+        winding = 0
+        count = len(self.vertex_list)
+        for i in range(count):
+            point_a = self.vertex_list[i]
+            point_b = self.vertex_list[(i + 1) % count]
+            if point_a.y <= point.y:
+                if point_b.y > point.y:
+                    if (point_b.x - point_a.x) * (point.y - point_a.y) - (point_b.y - point_a.y) * (point.x - point_a.x) > 0.0:
+                        winding += 1
+            elif point_b.y <= point.y:
+                if (point_b.x - point_a.x) * (point.y - point_a.y) - (point_b.y - point_a.y) * (point.x - point_a.x) < 0.0:
+                    winding -= 1
+        return winding
 
     def ContainsPointOnBorder(self, point, epsilon=1e-7):
-        for line in self.GenerateLineSegments():
-            if line.ContainsPoint(point, epsilon):
+        # This is LineSegment.ContainsPoint applied to each edge, but without making all the line segments.
+        count = len(self.vertex_list)
+        for i in range(count):
+            point_a = self.vertex_list[i]
+            point_b = self.vertex_list[(i + 1) % count]
+            ax = point_b.x - point_a.x
+            ay = point_b.y - point_a.y
+            bx = point.x - point_a.x
+            by = point.y - point_a.y
+            length_squared = ax * ax + ay * ay
+            if length_squared == 0.0:
+                continue
+            cross = ax * by - ay * bx
+            if cross * cross >= epsilon * epsilon * length_squared:
+                continue
+            lerp_value = (ax * bx + ay * by) / length_squared
+            if -epsilon < lerp_value < 1.0 + epsilon:
                 return True
         return False
 
+    def ContainsPointsOnBorder(self, point_array, epsilon=1e-7):
+        # This is a batch version of ContainsPointOnBorder.
+        import numpy
+        order, x, y = self._SortPoints(point_array)
+        result = numpy.empty(len(y), dtype=bool)
+        result[order] = self._ContainsSortedPointsOnBorder(x, y, epsilon)
+        return result
+
+    def _ContainsSortedPointsOnBorder(self, x, y, epsilon):
+        import numpy
+        on_border = numpy.zeros(len(y), dtype=bool)
+        count = len(self.vertex_list)
+        for i in range(count):
+            point_a = self.vertex_list[i]
+            point_b = self.vertex_list[(i + 1) % count]
+            ax = point_b.x - point_a.x
+            ay = point_b.y - point_a.y
+            length_squared = ax * ax + ay * ay
+            if length_squared == 0.0:
+                continue
+            # Any point passing the test below is within this much of the edge's range of y.
+            margin = 2.0 * epsilon * (math.fabs(ay) + 1.0)
+            lo, hi = numpy.searchsorted(y, (min(point_a.y, point_b.y) - margin, max(point_a.y, point_b.y) + margin), side='left')
+            bx = x[lo:hi] - point_a.x
+            by = y[lo:hi] - point_a.y
+            lerp_value = (ax * bx + ay * by) / length_squared
+            cross = ax * by - ay * bx
+            on_border[lo:hi] |= (cross * cross < epsilon * epsilon * length_squared) & (-epsilon < lerp_value) & (lerp_value < 1.0 + epsilon)
+        return on_border
+
     def SplitLineSegment(self, given_line_segment, assume_convex=False):
         # Chop up the given line segment against this polygon.
         line_segment_list = []
@@ -228,8 +396,8 @@ class Polygon(object):
         return in_list, out_list
 
     def Transform(self, transform, preserve_winding=True):
-        for i, point in enumerate(self.vertex_list):
-            self.vertex_list[i] = transform.Transform(point)
+        # Note that we build a new list here rather than update the old one in place so that the vertex index notices the change.
+        self.vertex_list = transform.TransformMany(self.vertex_list)
         if preserve_winding:
             det = transform.Determinant()
             if det < 0.0:
@@ -239,18 +407,14 @@ class Polygon(object):
         self.vertex_list = [point for point in reversed(self.vertex_list)]
     
     def IsWoundCCW(self, epsilon=1e-7):
+        # Polygons with no area have no definite winding, so they get None.  Any other area decides it by its sign
+        # alone, whatever the scale of the polygon, so epsilon is no longer used here.
         if len(self.vertex_list) <= 2:
             return None
-        net_angle = 0.0
-        for i in range(len(self.vertex_list)):
-            j = (i + 1) % len(self.vertex_list)
-            k = (i + 2) % len(self.vertex_list)
-            vector_a = self.vertex_list[j] - self.vertex_list[i]
-            vector_b = self.vertex_list[k] - self.vertex_list[j]
-            net_angle += vector_a.SignedAngleBetween(vector_b)
-        if math.fabs(net_angle - 2.0 * math.pi) < epsilon:
+        signed_area = self.SignedArea()
+        if signed_area > 0.0:
             return True
-        elif math.fabs(net_angle + 2.0 * math.pi) < epsilon:
+        elif signed_area < 0.0:
             return False
         return None
 
@@ -276,52 +440,32 @@ class Polygon(object):
 
     def IsSymmetry(self, transform):
         polygon = transform * self
+        # Each vertex of the transformed polygon may be matched only once.
+        vertex_index = VertexIndex().Sync(polygon.vertex_list)
         for vertex in self.vertex_list:
-            i = polygon.FindVertex(vertex)
+            i = vertex_index.Find(vertex)
             if i is None:
                 return False
-            del polygon.vertex_list[i]
+            vertex_index.Remove(i)
         return True
     
     def FindVertex(self, given_vertex, epsilon=1e-7):
-        for i, vertex in enumerate(self.vertex_list):
-            if vertex.IsPoint(given_vertex, epsilon):
-                return i
-        return None
+        return self.vertex_index.Sync(self.vertex_list).Find(given_vertex, epsilon)
     
     def IntersectWith(self, polygon):
-        from math2d_planar_graph import PlanarGraph
-        polygon_list = []
-        self.Tessellate()
-        graph = PlanarGraph()
-        graph.Add(polygon)
-        graph.Add(self, disposition={'replace_edges': True})
-        while True:
-            for i, vertex in enumerate(graph.vertex_list):
-                if self.ContainsPoint(vertex) and polygon.ContainsPoint(vertex):
-                    break
-            else:
-                break
-            intersect_polygon = Polygon()
-            polygon_list.append(intersect_polygon)
-            visited_vertices = set()
-            while True:
-                visited_vertices.add(i)
-                vertex = graph.vertex_list[i]
-                intersect_polygon.vertex_list.append(vertex)
-                adjacency_list = graph.FindAllAdjacencies(i, ignore_direction=True, vertices=True)
-                for i in adjacency_list:
-                    if i not in visited_vertices:
-                        vertex = graph.vertex_list[i]
-                        if self.ContainsPoint(vertex) and polygon.ContainsPoint(vertex):
-                            break
-                else:
-                    break
-            if not intersect_polygon.IsWoundCCW():
-                intersect_polygon.ReverseWinding()
-            for vertex in intersect_polygon.vertex_list:
-                graph.RemoveVertex(vertex)
-        return polygon_list
+        # Return the intersection of this polygon with the given polygon as a list of CCW polygons.
+        # If a piece of the intersection has holes, we return a polygon covering the same area.
+        from math2d_region import Region, SubRegion
+        region_list = []
+        for given_polygon in [self, polygon]:
+            given_polygon = given_polygon.Copy()
+            if given_polygon.IsWoundCW():
+                given_polygon.ReverseWinding()
+            region = Region()
+            region.sub_region_list.append(SubRegion(given_polygon))
+            region_list.append(region)
+        region = Region().Intersect(region_list[0], region_list[1])
+        return [sub_region.GeneratePolygon() for sub_region in region.sub_region_list]
 
     def Render(self):
         from OpenGL.GL import glBegin, glEnd, glVertex2f, GL_LINE_LOOP
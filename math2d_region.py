@@ -1,7 +1,9 @@
 # math2d_region.py
 
 import copy
+import math
 
+from math2d_vector import Vector
 from math2d_polygon import Polygon
 from math2d_line_segment import LineSegment
 
@@ -9,8 +11,13 @@ class Region(object):
     # These are simply collections of sub-regions.  The sub-regions are assumed
     # to be pair-wise disjoint from one another.  If this requirement is not
     # satisfied, then the result of any method is left undefined.
+    # A point locator may be cached for fast batches of containment queries; see Locator().  It is rebuilt when
+    # any perimeter or hole vertex list is replaced, grown or shrunk, but call Invalidate() after replacing a
+    # vertex in place.
     def __init__(self):
         self.sub_region_list = []
+        self.locator = None
+        self.locator_key = None
     
     def Copy(self):
         return copy.deepcopy(self)
@@ -38,25 +45,67 @@ class Region(object):
     
     def GenerateMesh(self):
         from math2d_tri_mesh import TriangleMesh
-        polygon_list = self.TessellatePolygons()
         mesh = TriangleMesh()
-        for polygon in polygon_list:
-            for triangle in polygon.mesh.GenerateTriangles():
-                mesh.AddTriangle(triangle)
+        for sub_region in self.sub_region_list:
+            sub_region._GenerateMesh(mesh)
         return mesh
     
     def GenerateLineMesh(self, thickness=0.5):
         from math2d_planar_graph import PlanarGraph
         graph = PlanarGraph()
-        graph.Add(self)
+        graph.AddMany(self)
         return graph.GenerateLineMesh(thickness)
     
+    def Invalidate(self):
+        self.locator = None
+        self.locator_key = None
+
+    def _LocatorKey(self):
+        key = [self.sub_region_list, len(self.sub_region_list)]
+        for sub_region in self.sub_region_list:
+            for polygon in [sub_region.polygon] + sub_region.hole_list:
+                vertex_list = polygon.vertex_list
+                key.append((vertex_list, len(vertex_list), vertex_list[-1] if len(vertex_list) > 0 else None))
+        return key
+
+    def _IsLocatorCurrent(self, epsilon):
+        # We walk the stored key rather than build a new one just to compare it.
+        if self.locator is None or self.locator.epsilon != epsilon:
+            return False
+        key = self.locator_key
+        if key[0] is not self.sub_region_list or key[1] != len(self.sub_region_list):
+            return False
+        k = 2
+        for sub_region in self.sub_region_list:
+            if k + len(sub_region.hole_list) >= len(key):
+                return False
+            for polygon in [sub_region.polygon] + sub_region.hole_list:
+                vertex_list = polygon.vertex_list
+                ring = key[k]
+                if ring[0] is not vertex_list or ring[1] != len(vertex_list) or (ring[1] > 0 and ring[2] is not vertex_list[-1]):
+                    return False
+                k += 1
+        return k == len(key)
+
+    def Locator(self, epsilon=1e-7):
+        # Return a point locator for this region, building it only if necessary.  Its ContainsPoint method
+        # agrees with ours, but is much faster for many queries against the same region.
+        from math2d_point_locator import PointLocator
+        if not self._IsLocatorCurrent(epsilon):
+            self.locator = PointLocator(self, epsilon)
+            self.locator_key = self._LocatorKey()
+        return self.locator
+
     def ContainsPoint(self, point, epsilon=1e-7):
         for sub_region in self.sub_region_list:
             if sub_region.ContainsPoint(point, epsilon):
                 return True
         return False
 
+    def ContainsPoints(self, point_array, epsilon=1e-7):
+        # This is a batch version of ContainsPoint, returning an array of booleans.
+        return self.Locator(epsilon).ContainsPoints(point_array)
+
     def ContainsPointOnBorder(self, point, epsilon=1e-7):
         for sub_region in self.sub_region_list:
             if sub_region.ContainsPointOnBorder(point, epsilon):
@@ -64,17 +113,39 @@ class Region(object):
         return False
         
     def CutAgainst(self, other):
+        # To cut this region against many others, use a cut session directly.
+        from math2d_cut_session import CutSession
+        return CutSession(self).Cut(other)
+    
+    def _ApplyBooleanOperation(self, region_a, region_b, operation, epsilon=1e-7):
+        # Make this region the result of the given operation on the given regions, which may be this region.  For n edges
+        # in all, of which k pairs have overlapping bounding boxes, building the arrangement takes about O((n + k) log n)
+        # time.  The k includes pairs that overlap without crossing, like long diagonal edges lying side by side.
+        # Locating the pieces off both borders uses each region's point locator, whose slabs can take O(n^2) time and
+        # space to build when many long edges span many distinct vertex x-coordinates.
         from math2d_planar_graph import PlanarGraph, PlanarGraphEdgeLabel
         graph = PlanarGraph()
-        graph.Add(self, {'edge_label': PlanarGraphEdgeLabel.REGION_BORDER})
-        graph.Add(other, {'edge_label': PlanarGraphEdgeLabel.CUT})
-        return graph.ApplyCuts(self)
-    
-    def Intersect(self, region_a, region_b):
-        pass # This is an interesting problem for another day.
+        graph.AddMany(region_a, {'edge_label': PlanarGraphEdgeLabel.REGION_BORDER, 'duplicate_edges': True}, epsilon)
+        graph.AddMany(region_b, {'edge_label': PlanarGraphEdgeLabel.CUT, 'duplicate_edges': True}, epsilon)
+        region = graph.ApplyBooleanOperation(region_a, region_b, operation, epsilon)
+        self.sub_region_list = region.sub_region_list
+        return self
+
+    def Intersect(self, region_a, region_b, epsilon=1e-7):
+        from math2d_planar_graph import PlanarGraphBooleanOperation
+        return self._ApplyBooleanOperation(region_a, region_b, PlanarGraphBooleanOperation.INTERSECTION, epsilon)
     
-    def Union(self, region_a, region_b):
-        pass # This is an interesting problem for another day.
+    def Union(self, region_a, region_b, epsilon=1e-7):
+        from math2d_planar_graph import PlanarGraphBooleanOperation
+        return self._ApplyBooleanOperation(region_a, region_b, PlanarGraphBooleanOperation.UNION, epsilon)
+
+    def Difference(self, region_a, region_b, epsilon=1e-7):
+        from math2d_planar_graph import PlanarGraphBooleanOperation
+        return self._ApplyBooleanOperation(region_a, region_b, PlanarGraphBooleanOperation.DIFFERENCE, epsilon)
+
+    def SymmetricDifference(self, region_a, region_b, epsilon=1e-7):
+        from math2d_planar_graph import PlanarGraphBooleanOperation
+        return self._ApplyBooleanOperation(region_a, region_b, PlanarGraphBooleanOperation.SYMMETRIC_DIFFERENCE, epsilon)
     
     def Render(self):
         for sub_region in self.sub_region_list:
@@ -118,6 +189,16 @@ class SubRegion(object):
         # finding the best polygon according to some sort of metric.  We're
         # just finding the first one we can find that works.
         sub_region = self.Copy()
+        if len(sub_region.hole_list) == 0:
+            return sub_region.polygon
+        try:
+            return HoleBridger(sub_region).GeneratePolygon()
+        except HoleBridgerError:
+            return sub_region._GeneratePolygonBruteForce()
+
+    def _GeneratePolygonBruteForce(self):
+        # This is the original algorithm, which tries every pair of vertices as a bridge.  It is very slow.
+        sub_region = self.Copy()
         while len(sub_region.hole_list) > 0:
             # Try to merge a hole with the perimeter to expand the perimeter.
             for i, hole in enumerate(sub_region.hole_list):
@@ -186,6 +267,26 @@ class SubRegion(object):
         polygon.Tessellate()
         return polygon
 
+    def GenerateMesh(self):
+        from math2d_tri_mesh import TriangleMesh
+        mesh = TriangleMesh()
+        self._GenerateMesh(mesh)
+        return mesh
+
+    def _GenerateMesh(self, given_mesh):
+        # Triangulate the perimeter and holes as they are, which avoids the cost of GeneratePolygon.
+        # Only if that fails do we fall back to tessellating the self-tangential polygon.  Either way, the
+        # triangles are welded in bulk, since neighboring sub-regions may share border vertices.
+        from math2d_triangulator import SweepTriangulator, SweepTriangulatorError
+        try:
+            triangulator = SweepTriangulator([self.polygon.vertex_list] + [hole.vertex_list[::-1] for hole in self.hole_list])
+            triple_list = triangulator.Triangulate()
+        except SweepTriangulatorError:
+            polygon = self.TessellatePolygon()
+            given_mesh.AddMesh(polygon.mesh)
+        else:
+            given_mesh.AddTriangleTriples(triangulator.point_list, triple_list)
+
     def Tessellate(self):
         self.polygon.Tessellate()
         for hole in self.hole_list:
@@ -199,6 +300,16 @@ class SubRegion(object):
                 return False
         return True
     
+    def ContainsPoints(self, point_array, epsilon=1e-7):
+        # This is a batch version of ContainsPoint, returning an array of booleans.
+        from math2d_vector_array import VectorArray
+        if not isinstance(point_array, VectorArray):
+            point_array = VectorArray().FromVectors(point_array)
+        contained = self.polygon.ContainsPoints(point_array, epsilon)
+        for hole in self.hole_list:
+            contained &= ~hole.ContainsPoints(point_array, epsilon)
+        return contained
+
     def ContainsPointOnBorder(self, point, epsilon=1e-7):
         if self.polygon.ContainsPointOnBorder(point, epsilon):
             return True
@@ -210,4 +321,166 @@ class SubRegion(object):
     def Render(self):
         self.polygon.Render()
         for hole in self.hole_list:
-            hole.Render()
\ No newline at end of file
+            hole.Render()
+
+class HoleBridgerError(Exception):
+    # This is what HoleBridger raises when it can't bridge a hole, so that callers can fall back to something else.
+    pass
+
+class HoleBridger(object):
+    # This merges the holes of a sub-region into its perimeter, one bridge per hole, producing the same
+    # sort of self-tangential polygon that SubRegion._MergePolygons does.  Holes are taken in order of
+    # their rightmost vertex, from right to left, and each is bridged to whatever a ray cast from that
+    # vertex in the +x direction hits first, which may well be a hole that was already merged.  The ray
+    # is cast against an index of edges bucketed by y, so the whole thing is about O(n log n).
+    # The polygon lives in a doubly-linked ring stored in flat arrays while we work on it.
+    def __init__(self, sub_region):
+        self.sub_region = sub_region
+        self.point_list = []
+        self.next_list = []
+        self.prev_list = []
+        vertex_count = len(sub_region.polygon.vertex_list) + sum([len(hole.vertex_list) for hole in sub_region.hole_list])
+        y_list = [vertex.y for vertex in sub_region.GenerateVertices()]
+        self.min_y = min(y_list)
+        self.bucket_size = max(max(y_list) - self.min_y, 1e-7) / max(1.0, math.sqrt(float(vertex_count)))
+        self.bucket_map = {}
+
+    def _AddRing(self, vertex_list):
+        base = len(self.point_list)
+        count = len(vertex_list)
+        self.point_list += vertex_list
+        self.next_list += [base + (i + 1) % count for i in range(count)]
+        self.prev_list += [base + (i - 1) % count for i in range(count)]
+        return base
+
+    def _Split(self, i):
+        # Make a new node at the same point, to be the other end of a bridge.
+        self.point_list.append(self.point_list[i])
+        self.next_list.append(None)
+        self.prev_list.append(None)
+        return len(self.point_list) - 1
+
+    def _BucketRange(self, i):
+        # Each node is indexed under the buckets spanned by the edge leaving it.
+        y_a = self.point_list[i].y
+        y_b = self.point_list[self.next_list[i]].y
+        return range(self._Bucket(min(y_a, y_b)), self._Bucket(max(y_a, y_b)) + 1)
+
+    def _Bucket(self, y):
+        return int(math.floor((y - self.min_y) / self.bucket_size))
+
+    def _IndexEdge(self, i):
+        for key in self._BucketRange(i):
+            self.bucket_map.setdefault(key, set()).add(i)
+
+    def _UnindexEdge(self, i):
+        for key in self._BucketRange(i):
+            self.bucket_map[key].discard(i)
+
+    def _Cross(self, point_a, point_b, point_c):
+        return (point_b - point_a).Cross(point_c - point_a)
+
+    def _IsLocallyInside(self, i, point):
+        # Is the direction from node i toward the given point within the interior angle at node i?
+        vertex = self.point_list[i]
+        next_vertex = self.point_list[self.next_list[i]]
+        prev_vertex = self.point_list[self.prev_list[i]]
+        to_next = self._Cross(vertex, next_vertex, point) >= 0.0
+        from_prev = self._Cross(vertex, point, prev_vertex) >= 0.0
+        if self._Cross(prev_vertex, vertex, next_vertex) >= 0.0:
+            return to_next and from_prev
+        return to_next or from_prev
+
+    def _FindBridge(self, hole_point):
+        # Cast a ray in the +x direction from the given point, finding the nearest edge it hits.
+        # Only edges heading up can be hit from inside the polygon, since the interior is on their left.
+        hx = hole_point.x
+        hy = hole_point.y
+        hit_x = None
+        hit_i = None
+        for i in self.bucket_map.get(self._Bucket(hy), []):
+            point_a = self.point_list[i]
+            point_b = self.point_list[self.next_list[i]]
+            if point_a.y <= hy <= point_b.y and point_a.y < point_b.y:
+                x = point_a.x + (hy - point_a.y) * (point_b.x - point_a.x) / (point_b.y - point_a.y)
+                if x >= hx and (hit_x is None or x < hit_x):
+                    hit_x = x
+                    hit_i = i
+        if hit_i is None:
+            raise HoleBridgerError('Failed to find edge to the right of hole.')
+        # The end of the edge furthest right can see the hole, unless some reflex vertex is in the way,
+        # in which case the one of those making the smallest angle with the ray can.  All such vertices
+        # are in the triangle formed by the hole point, the hit point and the end point we chose.
+        j = self.next_list[hit_i]
+        bridge_i = hit_i if self.point_list[hit_i].x > self.point_list[j].x else j
+        bridge_point = self.point_list[bridge_i]
+        if bridge_point.y == hy:
+            return bridge_i
+        hit_point = Vector(hit_x, hy)
+        if bridge_point.y > hy:
+            corner_list = [hole_point, hit_point, bridge_point]
+        else:
+            corner_list = [hole_point, bridge_point, hit_point]
+        best_tan = math.fabs(bridge_point.y - hy) / max(bridge_point.x - hx, 1e-12)
+        min_key = self._Bucket(min(hy, bridge_point.y))
+        max_key = self._Bucket(max(hy, bridge_point.y))
+        visited_set = set()
+        for key in range(min_key, max_key + 1):
+            for i in self.bucket_map.get(key, []):
+                if i in visited_set or i == bridge_i:
+                    continue
+                visited_set.add(i)
+                point = self.point_list[i]
+                if point.x <= hx or point.x > max(hit_x, bridge_point.x):
+                    continue
+                if self._Cross(corner_list[0], corner_list[1], point) < 0.0 or \
+                   self._Cross(corner_list[1], corner_list[2], point) < 0.0 or \
+                   self._Cross(corner_list[2], corner_list[0], point) < 0.0:
+                    continue
+                tan = math.fabs(point.y - hy) / (point.x - hx)
+                if not self._IsLocallyInside(i, hole_point):
+                    continue
+                if tan < best_tan or (tan == best_tan and point.x < bridge_point.x):
+                    best_tan = tan
+                    bridge_i = i
+                    bridge_point = point
+        return bridge_i
+
+    def GeneratePolygon(self):
+        self._AddRing(self.sub_region.polygon.vertex_list)
+        for i in range(len(self.point_list)):
+            self._IndexEdge(i)
+        # Holes are stored CCW, but they must be traversed CW as part of the polygon.
+        hole_list = [hole.vertex_list[::-1] for hole in self.sub_region.hole_list]
+        hole_list.sort(key=lambda vertex_list: max([vertex.x for vertex in vertex_list]), reverse=True)
+        for vertex_list in hole_list:
+            base = self._AddRing(vertex_list)
+            hole_i = base + max(range(len(vertex_list)), key=lambda k: (vertex_list[k].x, -vertex_list[k].y))
+            bridge_i = self._FindBridge(self.point_list[hole_i])
+            # Splice the hole in as ... bridge, hole, ..., hole, bridge ... where the ends are duplicated.
+            self._UnindexEdge(bridge_i)
+            bridge_j = self._Split(bridge_i)
+            hole_j = self._Split(hole_i)
+            next_i = self.next_list[bridge_i]
+            prev_i = self.prev_list[hole_i]
+            self.next_list[bridge_j] = next_i
+            self.prev_list[next_i] = bridge_j
+            self.next_list[bridge_i] = hole_i
+            self.prev_list[hole_i] = bridge_i
+            self.next_list[prev_i] = hole_j
+            self.prev_list[hole_j] = prev_i
+            self.next_list[hole_j] = bridge_j
+            self.prev_list[bridge_j] = hole_j
+            for i in range(base, base + len(vertex_list)):
+                self._IndexEdge(i)
+            self._IndexEdge(bridge_i)
+            self._IndexEdge(bridge_j)
+            self._IndexEdge(hole_j)
+        polygon = Polygon()
+        i = 0
+        while True:
+            polygon.vertex_list.append(self.point_list[i])
+            i = self.next_list[i]
+            if i == 0:
+                break
+        return polygon
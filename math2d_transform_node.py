@@ -0,0 +1,132 @@
+# math2d_transform_node.py
+
+from math2d_affine_transform import AffineTransform
+
+class TransformNode(object):
+    # These make up a transform hierarchy, as in a scene-graph.  Each node has a transform local
+    # to its parent and, optionally, some geometry; that is, anything AffineTransform.Transform accepts.
+    # The world transform of each node, its inverse and determinant, and the node's geometry taken to
+    # world space are all cached.  Changing the local transform of a node marks only its sub-tree
+    # dirty, so nothing outside of that sub-tree ever gets recomputed.  Note that a dirty node always
+    # has only dirty descendants, which is what lets us stop early when marking nodes dirty.
+    # Nodes can be used in place of transforms; in particular, Polygon.Transform accepts them.
+    def __init__(self, local_transform=None, geometry=None):
+        self.parent = None
+        self.child_list = []
+        self.local_transform = local_transform if local_transform is not None else AffineTransform()
+        self.geometry = geometry
+        self.world_transform = None
+        self.world_inverse = None
+        self.world_determinant = None
+        self.world_geometry = None
+
+    def AddChild(self, node):
+        if node.parent is not None:
+            node.parent.RemoveChild(node)
+        node.parent = self
+        self.child_list.append(node)
+        node.MarkDirty()
+        return node
+
+    def RemoveChild(self, node):
+        for i in range(len(self.child_list)):
+            if self.child_list[i] is node:
+                del self.child_list[i]
+                node.parent = None
+                node.MarkDirty()
+                break
+
+    def SetLocalTransform(self, local_transform):
+        self.local_transform = local_transform
+        self.MarkDirty()
+
+    def SetGeometry(self, geometry):
+        # Also call this if the geometry was changed in place.
+        self.geometry = geometry
+        self.world_geometry = None
+
+    def IsDirty(self):
+        return self.world_transform is None
+
+    def MarkDirty(self):
+        queue = [self]
+        while len(queue) > 0:
+            node = queue.pop()
+            if node is not self and node.IsDirty():
+                continue
+            node.world_transform = None
+            node.world_inverse = None
+            node.world_determinant = None
+            node.world_geometry = None
+            queue += node.child_list
+
+    def WorldTransform(self):
+        if self.world_transform is None:
+            # Find the nearest clean ancestor, then work our way back down from there.
+            chain = []
+            node = self
+            while node is not None and node.IsDirty():
+                chain.append(node)
+                node = node.parent
+            for node in reversed(chain):
+                if node.parent is None:
+                    node.world_transform = node.local_transform.Copy()
+                else:
+                    node.world_transform = node.parent.world_transform * node.local_transform
+        return self.world_transform
+
+    def Determinant(self):
+        if self.world_determinant is None:
+            self.world_determinant = self.WorldTransform().Determinant()
+        return self.world_determinant
+
+    def Inverted(self):
+        # Like AffineTransform.Inverted, this gives the caller a transform of their own, so we hand out a copy of the
+        # cached inverse; changing it in place would otherwise go unnoticed by every later call.
+        if self.world_inverse is None:
+            self.world_inverse = self.WorldTransform().Inverted()
+        return self.world_inverse.Copy()
+
+    def WorldGeometry(self):
+        from math2d_polygon import Polygon
+        if self.world_geometry is None and self.geometry is not None:
+            if isinstance(self.geometry, Polygon):
+                # Polygons get their winding preserved, using our cached determinant to decide.
+                polygon = Polygon()
+                polygon.vertex_list = self.geometry.vertex_list
+                polygon.Transform(self)
+                self.world_geometry = polygon
+            else:
+                self.world_geometry = self.WorldTransform().Transform(self.geometry)
+        return self.world_geometry
+
+    def Transform(self, object):
+        return self.WorldTransform().Transform(object)
+
+    def TransformMany(self, point_list):
+        return self.WorldTransform().TransformMany(point_list)
+
+    def __call__(self, object):
+        return self.Transform(object)
+
+    def __mul__(self, other):
+        return self.Transform(other)
+
+    def GenerateNodes(self):
+        queue = [self]
+        while len(queue) > 0:
+            node = queue.pop()
+            yield node
+            queue += reversed(node.child_list)
+
+    def Update(self):
+        # Bring every node of this sub-tree up to date, returning how many of them actually needed it.
+        count = 0
+        for node in self.GenerateNodes():
+            if node.IsDirty() or (node.world_geometry is None and node.geometry is not None):
+                count += 1
+                if node.geometry is not None:
+                    node.WorldGeometry()
+                else:
+                    node.WorldTransform()
+        return count
@@ -5,13 +5,72 @@ import random
 
 from math2d_vector import Vector
 from math2d_triangle import Triangle
+from math2d_vertex_index import VertexIndex
+
+class TriangleIndex(object):
+    # This is a hash of the triangles of a mesh, used to keep them from repeating.  A triangle is keyed by its
+    # integer-triple, rotated to start with its least index, so that the key doesn't depend on which vertex the
+    # triple starts with, but does depend on its winding.  Like the vertex index, this is kept in sync with a list
+    # of triples.  Appending to that list is picked up incrementally by Sync().  Replacing the list, shrinking it,
+    # or replacing its last item causes a rebuild.  Replacing some other item of the list in place goes unnoticed,
+    # so callers doing that must call Invalidate().
+    def __init__(self):
+        self.Invalidate()
+
+    def Invalidate(self):
+        self.key_map = {}
+        self.item_list = None
+        self.last_item = None
+        self.size = 0
+
+    def Sync(self, item_list):
+        if item_list is not self.item_list or len(item_list) < self.size or (self.size > 0 and item_list[self.size - 1] is not self.last_item):
+            self.key_map = {}
+            self.item_list = item_list
+            self.size = 0
+        while self.size < len(item_list):
+            self.key_map.setdefault(self.Key(item_list[self.size]), self.size)
+            self.size += 1
+        if self.size > 0:
+            self.last_item = item_list[self.size - 1]
+        return self
+
+    @staticmethod
+    def Key(triple):
+        a, b, c = triple
+        if a <= b and a <= c:
+            return (a, b, c)
+        elif b <= c:
+            return (b, c, a)
+        return (c, a, b)
+
+    def Find(self, given_triple):
+        # Like a linear search would, we return the smallest matching index, or None.
+        return self.key_map.get(self.Key(given_triple))
 
 class TriangleMesh(object):
     # These are lists of triangles.  Each triangle is an integer-triple,
-    # each integer an index into the stored vertex list.
+    # each integer an index into the stored vertex list.  Vertices are welded
+    # and triangles kept from repeating through hashes kept in sync with these lists.
     def __init__(self):
         self.vertex_list = []
         self.triangle_list = []
+        self.vertex_index = VertexIndex()
+        self.triangle_index = TriangleIndex()
+        self.bvh = None # This is made the first time we need it.
+    
+    def Invalidate(self):
+        # Call this after replacing a vertex or triangle in place.
+        self.vertex_index.Invalidate()
+        self.triangle_index.Invalidate()
+        if self.bvh is not None:
+            self.bvh.Invalidate()
+    
+    def _BVH(self):
+        if self.bvh is None:
+            from math2d_bvh import BoundingVolumeHierarchy
+            self.bvh = BoundingVolumeHierarchy()
+        return self.bvh.Sync(self.vertex_list, self.triangle_list)
     
     def Copy(self):
         return copy.deepcopy(self)
@@ -41,31 +100,88 @@ class TriangleMesh(object):
         return area
     
     def ContainsPoint(self, point, epsilon=1e-7):
-        for triple in self.triangle_list:
-            triangle = self.MakeTriangleFromTriple(triple)
-            if triangle.ContainsPoint(point, epsilon):
-                return True
-        return False
+        return self._BVH().ContainsPoint(point, epsilon)
+    
+    def ContainsPoints(self, point_array, epsilon=1e-7):
+        # This is a batch version of ContainsPoint, taking a VectorArray, or a list of vectors, and returning an array of booleans.
+        return self._BVH().ContainsPoints(point_array, epsilon)
+    
+    def FindTriangle(self, point, epsilon=1e-7):
+        # Return the index of the triangle containing the given point, and the point's barycentric coordinates in it,
+        # or (None, None) if no triangle contains it.
+        return self._BVH().FindTriangle(point, epsilon)
+    
+    def FindTriangles(self, point_array, epsilon=1e-7):
+        # This is a batch version of FindTriangle, returning an array of triangle indices, -1 where there is no triangle,
+        # and an N x 3 array of barycentric coordinates.
+        return self._BVH().FindTriangles(point_array, epsilon)
+    
+    def CastRay(self, origin, direction, max_t=float('inf'), epsilon=1e-7):
+        # Return the index of the first triangle hit by the ray origin + t * direction, for t in [0, max_t], and the
+        # parameter t at which the ray enters it, or (None, None) if the ray hits nothing.
+        return self._BVH().CastRay(origin, direction, max_t, epsilon)
     
     def FindOrAddVertex(self, given_vertex, epsilon=1e-7):
-        for i, vertex in enumerate(self.vertex_list):
-            if given_vertex.IsPoint(vertex, epsilon):
-                return i
+        i = self.vertex_index.Sync(self.vertex_list).Find(given_vertex, epsilon)
+        if i is not None:
+            return i
         else:
             self.vertex_list.append(given_vertex)
             return len(self.vertex_list) - 1
     
     def FindOrAddTriangleTriple(self, given_triple):
-        for i, triple in enumerate(self.triangle_list):
-            if given_triple == triple:
-                return i
+        i = self.triangle_index.Sync(self.triangle_list).Find(given_triple)
+        if i is not None:
+            return i
         else:
             self.triangle_list.append(given_triple)
             return len(self.triangle_list) - 1
     
+    def AddTriangleTriples(self, point_list, triple_list):
+        # Add the given triangles, each an index triple into the given point list.  The points are
+        # welded to our own vertices, and triangles we already have are skipped.
+        vertex_index = self.vertex_index.Sync(self.vertex_list)
+        triangle_index = self.triangle_index.Sync(self.triangle_list)
+        index_map = {}
+        for triple in triple_list:
+            for i in triple:
+                if i not in index_map:
+                    j = vertex_index.Find(point_list[i])
+                    if j is None:
+                        self.vertex_list.append(point_list[i])
+                        vertex_index.Sync(self.vertex_list)
+                        j = len(self.vertex_list) - 1
+                    index_map[i] = j
+        for triple in triple_list:
+            triple = (index_map[triple[0]], index_map[triple[1]], index_map[triple[2]])
+            if triple[0] == triple[1] or triple[1] == triple[2] or triple[2] == triple[0]:
+                continue
+            if triangle_index.Find(triple) is None:
+                self.triangle_list.append(triple)
+                triangle_index.Sync(self.triangle_list)
+
+    def AppendTriangleTriples(self, point_list, triple_list):
+        # Add the given triangles, each an index triple into the given point list, along with all of those points,
+        # just offsetting the indices past our own vertices.  Nothing is welded or checked for repeats, so this is
+        # for triangles known not to share any vertices or triangles with us, like those of a single triangulation.
+        offset = len(self.vertex_list)
+        self.vertex_list += point_list
+        if offset == 0:
+            self.triangle_list += [tuple(triple) for triple in triple_list]
+        else:
+            self.triangle_list += [(triple[0] + offset, triple[1] + offset, triple[2] + offset) for triple in triple_list]
+
+    def AppendMesh(self, mesh):
+        self.AppendTriangleTriples(mesh.vertex_list, mesh.triangle_list)
+
     def AddMesh(self, mesh):
-        for triangle in mesh.GenerateTriangles():
-            self.AddTriangle(triangle)
+        # The given mesh's triangles are welded to ours in bulk, after fixing any that wind CW.
+        triple_list = []
+        for triple in mesh.triangle_list:
+            if mesh.MakeTriangleFromTriple(triple).Area() < 0.0:
+                triple = (triple[0], triple[2], triple[1])
+            triple_list.append(triple)
+        self.AddTriangleTriples(mesh.vertex_list, triple_list)
     
     def GenerateTriangles(self):
         for triple in self.triangle_list:
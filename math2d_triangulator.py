@@ -0,0 +1,467 @@
+# math2d_triangulator.py
+
+import math
+import heapq
+import bisect
+
+class EarClipper(object):
+    # This triangulates a polygon given as a list of points wound CCW in the plane by clipping ears.
+    # The polygon's vertices live in a doubly-linked ring stored in flat arrays.  The only vertices
+    # that can spoil an ear are the reflex ones, so we keep just those in a uniform grid, and an ear
+    # test need only look at the few of them in the grid cells overlapped by the candidate ear.
+    # Candidate ears are tried from a priority queue, shortest diagonal first, so that ears stay small.
+    # Self-tangential polygons, like those made by SubRegion.GeneratePolygon, are fine here, because
+    # a point coinciding with a corner of a candidate ear is never considered to be inside of it.
+    # The result is a list of index triples into the given point list, each wound CCW.
+    # If we ever get stuck, which should only happen for invalid input, then Triangulate() returns
+    # the indices of the ring that remains, so that the caller can decide what to do with it.
+    def __init__(self, point_list, epsilon=1e-7):
+        self.point_list = point_list
+        self.epsilon = epsilon
+        count = len(point_list)
+        self.x_list = [point.x for point in point_list]
+        self.y_list = [point.y for point in point_list]
+        self.next_list = [(i + 1) % count for i in range(count)]
+        self.prev_list = [(i - 1) % count for i in range(count)]
+        self.count = count
+        self.reflex_grid = {}
+        self.reflex_set = set()
+        if count > 0:
+            min_x = min(self.x_list)
+            max_x = max(self.x_list)
+            min_y = min(self.y_list)
+            max_y = max(self.y_list)
+            cells = max(1, int(math.sqrt(count)))
+            self.min_x = min_x
+            self.min_y = min_y
+            self.cell_size = max(max_x - min_x, max_y - min_y, epsilon) / float(cells)
+
+    def _Cross(self, i, j, k):
+        x_list = self.x_list
+        y_list = self.y_list
+        return (x_list[j] - x_list[i]) * (y_list[k] - y_list[i]) - (y_list[j] - y_list[i]) * (x_list[k] - x_list[i])
+
+    def _Cell(self, x, y):
+        return (int(math.floor((x - self.min_x) / self.cell_size)), int(math.floor((y - self.min_y) / self.cell_size)))
+
+    def _AddReflex(self, i):
+        if i not in self.reflex_set:
+            self.reflex_set.add(i)
+            self.reflex_grid.setdefault(self._Cell(self.x_list[i], self.y_list[i]), set()).add(i)
+
+    def _RemoveReflex(self, i):
+        if i in self.reflex_set:
+            self.reflex_set.remove(i)
+            key = self._Cell(self.x_list[i], self.y_list[i])
+            bucket = self.reflex_grid[key]
+            bucket.discard(i)
+            if len(bucket) == 0:
+                del self.reflex_grid[key]
+
+    def _UpdateReflex(self, i):
+        if self._Cross(self.prev_list[i], i, self.next_list[i]) <= 0.0:
+            self._AddReflex(i)
+        else:
+            self._RemoveReflex(i)
+
+    def _Unlink(self, i):
+        prev_i = self.prev_list[i]
+        next_i = self.next_list[i]
+        self.next_list[prev_i] = next_i
+        self.prev_list[next_i] = prev_i
+        self._RemoveReflex(i)
+        self.count -= 1
+
+    def _IsDegenerate(self, i):
+        # A vertex is redundant if it coincides with its successor, or if it lies on a straight line
+        # (or a zero-area spike) between its neighbors.  Either way, dropping it loses no area.
+        x_list = self.x_list
+        y_list = self.y_list
+        j = self.next_list[i]
+        if math.fabs(x_list[i] - x_list[j]) < self.epsilon and math.fabs(y_list[i] - y_list[j]) < self.epsilon:
+            return True
+        return math.fabs(self._Cross(self.prev_list[i], i, j)) <= self.epsilon
+
+    def _IsEar(self, i):
+        a = self.prev_list[i]
+        c = self.next_list[i]
+        if self._Cross(a, i, c) <= 0.0:
+            return False
+        x_list = self.x_list
+        y_list = self.y_list
+        ax, ay = x_list[a], y_list[a]
+        bx, by = x_list[i], y_list[i]
+        cx, cy = x_list[c], y_list[c]
+        min_x, max_x = min(ax, bx, cx), max(ax, bx, cx)
+        min_y, max_y = min(ay, by, cy), max(ay, by, cy)
+        min_cell = self._Cell(min_x, min_y)
+        max_cell = self._Cell(max_x, max_y)
+        cell_count = (max_cell[0] - min_cell[0] + 1) * (max_cell[1] - min_cell[1] + 1)
+        if cell_count > len(self.reflex_set):
+            # Big ears tend to show up late, once few reflex vertices remain, so just visit those.
+            bucket_list = [self.reflex_set]
+        elif cell_count <= 16:
+            bucket_list = []
+            for cell_x in range(min_cell[0], max_cell[0] + 1):
+                for cell_y in range(min_cell[1], max_cell[1] + 1):
+                    bucket = self.reflex_grid.get((cell_x, cell_y))
+                    if bucket is not None:
+                        bucket_list.append(bucket)
+        else:
+            # Visit only the cells of each column that the ear actually overlaps, rather than every
+            # cell of its bounding box, which matters for long and thin ears that run diagonally.
+            bucket_list = []
+            edge_list = [(ax, ay, bx, by), (bx, by, cx, cy), (cx, cy, ax, ay)]
+            for cell_x in range(min_cell[0], max_cell[0] + 1):
+                x0 = max(min_x, self.min_x + cell_x * self.cell_size)
+                x1 = min(max_x, self.min_x + (cell_x + 1) * self.cell_size)
+                y0 = max_y
+                y1 = min_y
+                for ex0, ey0, ex1, ey1 in edge_list:
+                    if ex0 > ex1:
+                        ex0, ey0, ex1, ey1 = ex1, ey1, ex0, ey0
+                    lo = max(x0, ex0)
+                    hi = min(x1, ex1)
+                    if lo > hi:
+                        continue
+                    if ex1 - ex0 <= 0.0:
+                        y0 = min(y0, ey0, ey1)
+                        y1 = max(y1, ey0, ey1)
+                        continue
+                    slope = (ey1 - ey0) / (ex1 - ex0)
+                    ya = ey0 + (lo - ex0) * slope
+                    yb = ey0 + (hi - ex0) * slope
+                    y0 = min(y0, ya, yb)
+                    y1 = max(y1, ya, yb)
+                if y0 > y1:
+                    continue
+                for cell_y in range(self._Cell(x0, y0)[1], self._Cell(x0, y1)[1] + 1):
+                    bucket = self.reflex_grid.get((cell_x, cell_y))
+                    if bucket is not None:
+                        bucket_list.append(bucket)
+        for bucket in bucket_list:
+            for p in bucket:
+                if p == a or p == c:
+                    continue
+                px, py = x_list[p], y_list[p]
+                if px < min_x or px > max_x or py < min_y or py > max_y:
+                    continue
+                if (px == ax and py == ay) or (px == bx and py == by) or (px == cx and py == cy):
+                    continue
+                if (bx - ax) * (py - ay) - (by - ay) * (px - ax) >= 0.0 and \
+                   (cx - bx) * (py - by) - (cy - by) * (px - bx) >= 0.0 and \
+                   (ax - cx) * (py - cy) - (ay - cy) * (px - cx) >= 0.0:
+                    return False
+        return True
+
+    def _Push(self, i):
+        # Ears with short diagonals go first.  This keeps the ears local, and so their boxes small.
+        a = self.prev_list[i]
+        c = self.next_list[i]
+        dx = self.x_list[c] - self.x_list[a]
+        dy = self.y_list[c] - self.y_list[a]
+        self.version_list[i] += 1
+        heapq.heappush(self.heap, (dx * dx + dy * dy, i, self.version_list[i]))
+
+    def _Remove(self, i):
+        prev_i = self.prev_list[i]
+        next_i = self.next_list[i]
+        self._Unlink(i)
+        self.removed_list[i] = True
+        if self.head == i:
+            self.head = next_i
+        self._UpdateReflex(prev_i)
+        self._UpdateReflex(next_i)
+        self._Push(prev_i)
+        self._Push(next_i)
+
+    def Triangulate(self):
+        triple_list = []
+        if self.count < 3:
+            return triple_list, []
+        point_count = len(self.point_list)
+        self.heap = []
+        self.version_list = [0] * point_count
+        self.removed_list = [False] * point_count
+        self.head = 0
+        for i in range(point_count):
+            self._UpdateReflex(i)
+            self._Push(i)
+        progress = True
+        while self.count > 3:
+            if len(self.heap) == 0:
+                # A vertex rejected as an ear may have become one since, because the reflex vertex
+                # that spoiled it went away, so make another pass over whatever is left.
+                if not progress:
+                    # We went all the way around without finding an ear.
+                    ring_list = [self.head]
+                    j = self.next_list[self.head]
+                    while j != self.head:
+                        ring_list.append(j)
+                        j = self.next_list[j]
+                    return triple_list, ring_list
+                progress = False
+                i = self.head
+                while True:
+                    self._Push(i)
+                    i = self.next_list[i]
+                    if i == self.head:
+                        break
+                continue
+            i, version = heapq.heappop(self.heap)[1:]
+            if self.removed_list[i] or version != self.version_list[i]:
+                continue
+            if self._IsDegenerate(i):
+                self._Remove(i)
+                progress = True
+            elif self._IsEar(i):
+                triple_list.append((self.prev_list[i], i, self.next_list[i]))
+                self._Remove(i)
+                progress = True
+        if self.count == 3:
+            i = self.head
+            prev_i = self.prev_list[i]
+            next_i = self.next_list[i]
+            if self._Cross(prev_i, i, next_i) > self.epsilon:
+                triple_list.append((prev_i, i, next_i))
+        return triple_list, []
+
+class SweepTriangulatorError(Exception):
+    # This is what SweepTriangulator raises for input it can't handle, so that callers can fall back to something else.
+    pass
+
+class SweepTriangulator(object):
+    # This triangulates a polygon with holes directly, without first bridging the holes to the perimeter.
+    # A sweep from top to bottom adds the diagonals needed to break the polygon into y-monotone pieces,
+    # and each piece is then triangulated with the usual stack-based algorithm.  Sorting the vertices
+    # takes O(n log n), as do the binary searches of the sweep status, and the pieces take O(n) all told.
+    # The status, though, is a plain list, so each insertion or removal also shifts, or in the case of a
+    # removal, scans, up to s entries, where s is the most edges the sweep line ever crosses.  That makes
+    # the whole O(n log n + n s), which is O(n^2) at worst, though the list operations run in C and only
+    # come to dominate when s is in the many thousands.
+    # Rings are given as lists of points oriented so that the interior is on the left of every edge;
+    # that is, the perimeter is wound CCW and the holes CW.  The result is a list of index triples,
+    # each wound CCW, into the concatenation of the given rings.  Input breaking the rules above, or
+    # degenerate enough to throw the sweep off, raises a SweepTriangulatorError.
+    START, END, SPLIT, MERGE, REGULAR = range(5)
+
+    def __init__(self, ring_list, epsilon=1e-7):
+        self.epsilon = epsilon
+        self.point_list = []
+        self.next_list = []
+        self.prev_list = []
+        for ring in ring_list:
+            base = len(self.point_list)
+            count = len(ring)
+            if count < 3:
+                raise SweepTriangulatorError('Rings must have at least three vertices.')
+            self.point_list += ring
+            self.next_list += [base + (i + 1) % count for i in range(count)]
+            self.prev_list += [base + (i - 1) % count for i in range(count)]
+        # All of our decisions are made with the points snapped to an epsilon grid.  Otherwise, round-off
+        # error can make vertices that should be level with one another disagree about which is higher.
+        self.x_list = [round(point.x / epsilon) * epsilon for point in self.point_list]
+        self.y_list = [round(point.y / epsilon) * epsilon for point in self.point_list]
+
+    def _Cross(self, i, j, k):
+        x_list = self.x_list
+        y_list = self.y_list
+        return (x_list[j] - x_list[i]) * (y_list[k] - y_list[i]) - (y_list[j] - y_list[i]) * (x_list[k] - x_list[i])
+
+    def _IsBelow(self, i, j):
+        # Ties in y are broken by x, which is as if the plane were rotated ever so slightly.
+        return self.y_list[i] < self.y_list[j] or (self.y_list[i] == self.y_list[j] and self.x_list[i] > self.x_list[j])
+
+    def _Classify(self, i):
+        prev_below = self._IsBelow(self.prev_list[i], i)
+        next_below = self._IsBelow(self.next_list[i], i)
+        convex = self._Cross(self.prev_list[i], i, self.next_list[i]) > 0.0
+        if prev_below and next_below:
+            return self.START if convex else self.SPLIT
+        if not prev_below and not next_below:
+            return self.END if convex else self.MERGE
+        return self.REGULAR
+
+    def _EdgeX(self, k, y):
+        # Where edge k, from vertex k to its successor, crosses the sweep line at the given height.
+        j = self.next_list[k]
+        y0 = self.y_list[k]
+        y1 = self.y_list[j]
+        if y0 == y1:
+            return min(self.x_list[k], self.x_list[j])
+        t = (y - y0) / (y1 - y0)
+        return self.x_list[k] + t * (self.x_list[j] - self.x_list[k])
+
+    def _EdgeKey(self, k, y):
+        # Edges that cross the sweep line at the same place are ordered by where they go next.
+        j = self.next_list[k]
+        upper, lower = (k, j) if self._IsBelow(j, k) else (j, k)
+        dy = self.y_list[upper] - self.y_list[lower]
+        dx = self.x_list[lower] - self.x_list[upper]
+        return (self._EdgeX(k, y), dx / dy if dy > 0.0 else float('inf'))
+
+    def _FindLeftEdge(self, status_list, i):
+        # Binary search for the edge directly to the left of vertex i.
+        x = self.x_list[i]
+        y = self.y_list[i]
+        lo = 0
+        hi = len(status_list)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._EdgeX(status_list[mid], y) <= x:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo == 0:
+            raise SweepTriangulatorError('Failed to find edge left of vertex.')
+        return status_list[lo - 1]
+
+    def _InsertEdge(self, status_list, k, y):
+        key = self._EdgeKey(k, y)
+        lo = 0
+        hi = len(status_list)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._EdgeKey(status_list[mid], y) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        status_list.insert(lo, k)
+
+    def _PopHelper(self, helper_map, k):
+        # An edge can only go missing from the sweep if the rings cross themselves or one another.
+        if k not in helper_map:
+            raise SweepTriangulatorError('Lost track of edge during sweep.')
+        return helper_map.pop(k)
+
+    def _GenerateDiagonals(self):
+        # The status list holds the edges crossing the sweep line that have the interior to their right,
+        # ordered left to right, and each such edge is mapped to its helper vertex.
+        count = len(self.point_list)
+        order_list = sorted(range(count), key=lambda i: (-self.y_list[i], self.x_list[i], i))
+        type_list = [self._Classify(i) for i in range(count)]
+        status_list = []
+        helper_map = {}
+        diagonal_list = []
+        for i in order_list:
+            y = self.y_list[i]
+            vertex_type = type_list[i]
+            prev_i = self.prev_list[i]
+            if vertex_type == self.START:
+                self._InsertEdge(status_list, i, y)
+                helper_map[i] = i
+            elif vertex_type == self.END:
+                helper = self._PopHelper(helper_map, prev_i)
+                if type_list[helper] == self.MERGE:
+                    diagonal_list.append((i, helper))
+                status_list.remove(prev_i)
+            elif vertex_type == self.SPLIT:
+                k = self._FindLeftEdge(status_list, i)
+                diagonal_list.append((i, helper_map[k]))
+                helper_map[k] = i
+                self._InsertEdge(status_list, i, y)
+                helper_map[i] = i
+            elif vertex_type == self.MERGE:
+                helper = self._PopHelper(helper_map, prev_i)
+                if type_list[helper] == self.MERGE:
+                    diagonal_list.append((i, helper))
+                status_list.remove(prev_i)
+                k = self._FindLeftEdge(status_list, i)
+                if type_list[helper_map[k]] == self.MERGE:
+                    diagonal_list.append((i, helper_map[k]))
+                helper_map[k] = i
+            elif self._IsBelow(i, prev_i):
+                # The interior lies to the right of this vertex.
+                helper = self._PopHelper(helper_map, prev_i)
+                if type_list[helper] == self.MERGE:
+                    diagonal_list.append((i, helper))
+                status_list.remove(prev_i)
+                self._InsertEdge(status_list, i, y)
+                helper_map[i] = i
+            else:
+                k = self._FindLeftEdge(status_list, i)
+                if type_list[helper_map[k]] == self.MERGE:
+                    diagonal_list.append((i, helper_map[k]))
+                helper_map[k] = i
+        return diagonal_list
+
+    def _GenerateMonotonePieces(self, diagonal_list):
+        # Trace the faces of the boundary plus diagonals, always taking the sharpest right turn.
+        count = len(self.point_list)
+        outgoing_list = [[self.next_list[i]] for i in range(count)]
+        for i, j in diagonal_list:
+            outgoing_list[i].append(j)
+            outgoing_list[j].append(i)
+        heading_list = []
+        for i in range(count):
+            outgoing_list[i].sort(key=lambda j: math.atan2(self.y_list[j] - self.y_list[i], self.x_list[j] - self.x_list[i]))
+            heading_list.append([math.atan2(self.y_list[j] - self.y_list[i], self.x_list[j] - self.x_list[i]) for j in outgoing_list[i]])
+        visited_set = set()
+        for i in range(count):
+            for j in outgoing_list[i]:
+                if (i, j) in visited_set:
+                    continue
+                piece = []
+                a, b = i, j
+                while (a, b) not in visited_set:
+                    visited_set.add((a, b))
+                    piece.append(a)
+                    back_heading = math.atan2(self.y_list[a] - self.y_list[b], self.x_list[a] - self.x_list[b])
+                    k = bisect.bisect_left(heading_list[b], back_heading) - 1
+                    a, b = b, outgoing_list[b][k]
+                if (a, b) != (i, j):
+                    raise SweepTriangulatorError('Failed to trace monotone piece.')
+                yield piece
+
+    def _TriangulateMonotonePiece(self, piece, triple_list):
+        if len(piece) < 3:
+            raise SweepTriangulatorError('Encountered degenerate monotone piece.')
+        count = len(piece)
+        top = min(range(count), key=lambda k: (-self.y_list[piece[k]], self.x_list[piece[k]]))
+        bottom = max(range(count), key=lambda k: (-self.y_list[piece[k]], self.x_list[piece[k]]))
+        # Going CCW from the top vertex takes us down the left chain.
+        left_set = set()
+        k = top
+        while k != bottom:
+            left_set.add(piece[k])
+            k = (k + 1) % count
+        order_list = sorted(piece, key=lambda i: (-self.y_list[i], self.x_list[i]))
+        stack = [order_list[0], order_list[1]]
+        for j in range(2, count - 1):
+            u = order_list[j]
+            if (u in left_set) != (stack[-1] in left_set):
+                for k in range(len(stack) - 1):
+                    self._EmitTriangle(u, stack[k], stack[k + 1], triple_list)
+                stack = [order_list[j - 1], u]
+            else:
+                last = stack.pop()
+                sign = 1.0 if u in left_set else -1.0
+                while len(stack) > 0 and sign * self._Cross(stack[-1], last, u) > 0.0:
+                    self._EmitTriangle(u, last, stack[-1], triple_list)
+                    last = stack.pop()
+                stack.append(last)
+                stack.append(u)
+        u = order_list[count - 1]
+        for k in range(len(stack) - 1):
+            self._EmitTriangle(u, stack[k], stack[k + 1], triple_list)
+
+    def _EmitTriangle(self, i, j, k, triple_list):
+        cross = self._Cross(i, j, k)
+        if cross > 0.0:
+            triple_list.append((i, j, k))
+        elif cross < 0.0:
+            triple_list.append((i, k, j))
+
+    def Triangulate(self):
+        triple_list = []
+        for piece in self._GenerateMonotonePieces(self._GenerateDiagonals()):
+            self._TriangulateMonotonePiece(piece, triple_list)
+        # The sweep is not robust to every degeneracy, so make sure that what we made adds up.
+        expected_area = 0.0
+        for i in range(len(self.point_list)):
+            j = self.next_list[i]
+            expected_area += self.x_list[i] * self.y_list[j] - self.x_list[j] * self.y_list[i]
+        area = sum([self._Cross(*triple) for triple in triple_list])
+        if math.fabs(area - expected_area) > max(self.epsilon, 1e-9 * math.fabs(expected_area)):
+            raise SweepTriangulatorError('Failed to triangulate polygon with holes.')
+        return triple_list
@@ -2,14 +2,27 @@
 
 import math
 import random
+import functools
+
+@functools.lru_cache(maxsize=1024)
+def _SinCos(angle):
+    # The same few angles tend to get used over and over again, so we cache these.
+    return math.sin(angle), math.cos(angle)
 
 class Vector(object):
+    # Using slots here keeps each instance down to two references, which matters
+    # when we have millions of these.  It does mean we can't tack on arbitrary attributes.
+    # There are deliberately no in-place operators.  Vectors are shared freely, between polygons and
+    # the caches keyed on them, for instance, so a += b must make a new vector rather than change a.
+    __slots__ = ('x', 'y')
+
     def __init__(self, x=0.0, y=0.0, radius=None, angle=None):
         if angle is not None:
             if radius is None:
                 radius = 1.0
-            self.x = radius * math.cos(angle)
-            self.y = radius * math.sin(angle)
+            sin_angle, cos_angle = _SinCos(angle)
+            self.x = radius * cos_angle
+            self.y = radius * sin_angle
         else:
             self.x = x
             self.y = y
@@ -34,15 +47,20 @@ class Vector(object):
     
     def __mul__(self, other):
         return Vector(self.x * other, self.y * other)
+
+    def __rmul__(self, other):
+        return Vector(self.x * other, self.y * other)
     
-    def __div__(self, other):
+    def __truediv__(self, other):
         return Vector(self.x / other, self.y / other)
+
+    __div__ = __truediv__
     
     def __neg__(self):
         return Vector(-self.x, -self.y)
 
     def __hash__(self):
-        return hash(str(self.x) + ',' + str(self.y))
+        return hash((self.x, self.y))
 
     def Copy(self):
         return Vector(self.x, self.y)
@@ -94,8 +112,8 @@ class Vector(object):
         return self - self.Projected(normal)
     
     def Rotated(self, angle):
-        result = self.Complex() * Vector(angle=angle).Complex()
-        return Vector(result.real, result.imag)
+        sin_angle, cos_angle = _SinCos(angle)
+        return Vector(self.x * cos_angle - self.y * sin_angle, self.x * sin_angle + self.y * cos_angle)
 
     def RotatedCCW90(self):
         return Vector(-self.y, self.x)
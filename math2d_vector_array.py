@@ -0,0 +1,203 @@
+# math2d_vector_array.py
+
+import numpy
+
+from math2d_vector import Vector
+
+class VectorArray(object):
+    # These are collections of vectors stored as a structure of arrays: the x and y
+    # components live in two contiguous float64 columns.  Most methods here mirror
+    # those of the Vector class, but operate on the whole array at once, so that hot
+    # paths can run one numpy kernel instead of a Python loop over Vector objects.
+    # Where a Vector method returns a scalar, the method here returns a numpy array.
+    def __init__(self, x=None, y=None, size=0):
+        # Component arrays that are already contiguous float64 arrays are adopted without a copy.
+        self.x = numpy.ascontiguousarray(x if x is not None else numpy.zeros(size), dtype=numpy.float64)
+        self.y = numpy.ascontiguousarray(y if y is not None else numpy.zeros(size), dtype=numpy.float64)
+        if self.x.shape != self.y.shape or self.x.ndim != 1:
+            raise Exception('Component arrays must be one-dimensional and of equal length.')
+
+    def Copy(self):
+        return VectorArray(self.x.copy(), self.y.copy())
+
+    def Serialize(self):
+        json_data = {
+            'x': self.x.tolist(),
+            'y': self.y.tolist()
+        }
+        return json_data
+
+    def Deserialize(self, json_data):
+        self.x = numpy.array(json_data['x'], dtype=numpy.float64)
+        self.y = numpy.array(json_data['y'], dtype=numpy.float64)
+        return self
+
+    def FromVectors(self, vector_list):
+        # This is a single pass over the given vectors without any intermediate lists.
+        count = len(vector_list)
+        self.x = numpy.fromiter((vector.x for vector in vector_list), dtype=numpy.float64, count=count)
+        self.y = numpy.fromiter((vector.y for vector in vector_list), dtype=numpy.float64, count=count)
+        return self
+
+    def ToVectors(self):
+        return [Vector(x, y) for x, y in zip(self.x.tolist(), self.y.tolist())]
+
+    def FromMatrix(self, matrix):
+        # The given matrix is an N x 2 array of points, one point per row.
+        matrix = numpy.asarray(matrix, dtype=numpy.float64)
+        self.x = numpy.ascontiguousarray(matrix[:, 0])
+        self.y = numpy.ascontiguousarray(matrix[:, 1])
+        return self
+
+    def ToMatrix(self):
+        return numpy.column_stack((self.x, self.y))
+
+    def Size(self):
+        return self.x.shape[0]
+
+    def __len__(self):
+        return self.x.shape[0]
+
+    def __getitem__(self, key):
+        if isinstance(key, (int, numpy.integer)):
+            return Vector(float(self.x[key]), float(self.y[key]))
+        return VectorArray(self.x[key], self.y[key])
+
+    def __setitem__(self, key, vector):
+        self.x[key] = vector.x
+        self.y[key] = vector.y
+
+    def __iter__(self):
+        for x, y in zip(self.x.tolist(), self.y.tolist()):
+            yield Vector(x, y)
+
+    def __add__(self, other):
+        return VectorArray(self.x + other.x, self.y + other.y)
+
+    def __sub__(self, other):
+        return VectorArray(self.x - other.x, self.y - other.y)
+
+    def __mul__(self, other):
+        # The given scale may be a scalar or an array of per-vector scales.
+        return VectorArray(self.x * other, self.y * other)
+
+    def __rmul__(self, other):
+        return self.__mul__(other)
+
+    def __truediv__(self, other):
+        return VectorArray(self.x / other, self.y / other)
+
+    def __neg__(self):
+        return VectorArray(-self.x, -self.y)
+
+    def __iadd__(self, other):
+        self.x += other.x
+        self.y += other.y
+        return self
+
+    def __isub__(self, other):
+        self.x -= other.x
+        self.y -= other.y
+        return self
+
+    def __imul__(self, other):
+        self.x *= other
+        self.y *= other
+        return self
+
+    def IsPoint(self, point, epsilon=1e-7):
+        return (self - point).Length() < epsilon
+
+    def IsZero(self, epsilon=1e-7):
+        return self.Length() < epsilon
+
+    def Length(self):
+        return numpy.hypot(self.x, self.y)
+
+    def Normalize(self):
+        # Zero-length vectors are left as they are, just as Vector.Normalize leaves them.
+        length = self.Length()
+        mask = length > 0.0
+        self.x[mask] /= length[mask]
+        self.y[mask] /= length[mask]
+        return mask
+
+    def Normalized(self):
+        normalized = self.Copy()
+        normalized.Normalize()
+        return normalized
+
+    def Scale(self, scale):
+        self.x *= scale
+        self.y *= scale
+        return self
+
+    def Scaled(self, scale):
+        return VectorArray(self.x * scale, self.y * scale)
+
+    def Dot(self, other):
+        return self.x * other.x + self.y * other.y
+
+    def Cross(self, other):
+        return self.x * other.y - self.y * other.x
+
+    def Reflected(self, normal):
+        return self.Projected(normal) - self.Rejected(normal)
+
+    def Projected(self, normal):
+        dot = self.Dot(normal)
+        return VectorArray(normal.x * dot, normal.y * dot)
+
+    def Rejected(self, normal):
+        return self - self.Projected(normal)
+
+    def Rotated(self, angle):
+        # The angle may be a scalar or an array of per-vector angles.
+        cos_angle = numpy.cos(angle)
+        sin_angle = numpy.sin(angle)
+        return VectorArray(self.x * cos_angle - self.y * sin_angle, self.x * sin_angle + self.y * cos_angle)
+
+    def RotatedCCW90(self):
+        return VectorArray(-self.y, self.x.copy())
+
+    def RotatedCW90(self):
+        return VectorArray(self.y.copy(), -self.x)
+
+    def Heading(self):
+        return numpy.arctan2(self.y, self.x)
+
+    def AngleBetween(self, vector, assume_unit_length=False):
+        if assume_unit_length:
+            dot = self.Dot(vector)
+        else:
+            dot = self.Normalized().Dot(vector.Normalized())
+        return numpy.arccos(numpy.clip(dot, -1.0, 1.0))
+
+    def SignedAngleBetween(self, vector):
+        angle = self.AngleBetween(vector)
+        return numpy.where(self.Cross(vector) >= 0.0, angle, -angle)
+
+    def MaxComponents(self, vector=None):
+        # With no argument, this reduces the array to a single vector.
+        if vector is None:
+            return Vector(float(self.x.max()), float(self.y.max()))
+        return VectorArray(numpy.maximum(self.x, vector.x), numpy.maximum(self.y, vector.y))
+
+    def MinComponents(self, vector=None):
+        # With no argument, this reduces the array to a single vector.
+        if vector is None:
+            return Vector(float(self.x.min()), float(self.y.min()))
+        return VectorArray(numpy.minimum(self.x, vector.x), numpy.minimum(self.y, vector.y))
+
+    def Sum(self):
+        return Vector(float(self.x.sum()), float(self.y.sum()))
+
+    def Average(self):
+        if self.Size() == 0:
+            return None
+        return Vector(float(self.x.mean()), float(self.y.mean()))
+
+    def Random(self, size, component_min=0.0, component_max=1.0):
+        self.x = numpy.random.uniform(component_min, component_max, size)
+        self.y = numpy.random.uniform(component_min, component_max, size)
+        return self
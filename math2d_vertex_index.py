@@ -0,0 +1,93 @@
+# math2d_vertex_index.py
+
+import math
+
+class VertexIndex(object):
+    # This is a spatial hash used to weld vertices together.  Points are bucketed by their
+    # coordinates quantized to a grid, and a look-up probes every cell overlapped by the
+    # epsilon-box about the given point, so matches within epsilon are found even when
+    # they fall on the other side of a cell boundary.  The index does not own any points.
+    # Rather, it stores integer indices into a list that it is kept in sync with.
+    # Appending to that list is picked up incrementally by Sync().  Replacing the list,
+    # shrinking it, or replacing its last item causes a rebuild.  Replacing some other
+    # item of the list in place goes unnoticed, so callers doing that must call Invalidate().
+    def __init__(self, cell_size=2e-7, attribute=None):
+        self.cell_size = cell_size
+        self.attribute = attribute # If given, the points are found at this attribute of each list item.
+        self.bucket_map = {}
+        self.item_list = None
+        self.last_item = None
+        self.size = 0
+
+    def Invalidate(self):
+        self.bucket_map = {}
+        self.item_list = None
+        self.last_item = None
+        self.size = 0
+
+    def Sync(self, item_list):
+        if item_list is not self.item_list or len(item_list) < self.size or (self.size > 0 and item_list[self.size - 1] is not self.last_item):
+            self.bucket_map = {}
+            self.item_list = item_list
+            self.size = 0
+        while self.size < len(item_list):
+            self._Insert(self.size)
+            self.size += 1
+        if self.size > 0:
+            self.last_item = item_list[self.size - 1]
+        return self
+
+    def Point(self, i):
+        item = self.item_list[i]
+        return item if self.attribute is None else getattr(item, self.attribute)
+
+    def _Insert(self, i):
+        point = self.Point(i)
+        key = (math.floor(point.x / self.cell_size), math.floor(point.y / self.cell_size))
+        bucket = self.bucket_map.get(key)
+        if bucket is None:
+            self.bucket_map[key] = [i]
+        else:
+            bucket.append(i)
+
+    def Remove(self, i):
+        # Stop reporting the given index without touching the list itself.
+        # This is handy for one-to-one matching, where each point may be claimed only once.
+        point = self.Point(i)
+        key = (math.floor(point.x / self.cell_size), math.floor(point.y / self.cell_size))
+        bucket = self.bucket_map.get(key)
+        if bucket is not None and i in bucket:
+            bucket.remove(i)
+            if len(bucket) == 0:
+                del self.bucket_map[key]
+
+    def Truncate(self, size):
+        # Forget every index at or beyond the given size.  Call this just before shrinking the list to that
+        # size, and the next Sync() won't need to rebuild the index.
+        for i in range(size, self.size):
+            self.Remove(i)
+        self.size = min(size, self.size)
+        self.last_item = self.item_list[self.size - 1] if self.size > 0 else None
+
+    def Find(self, given_point, epsilon=1e-7):
+        # Like a linear search would, we return the smallest matching index, or None.
+        if self.cell_size < epsilon:
+            # Keep the cells at least as large as epsilon so that we never probe more than 2x2 of them.
+            item_list = self.item_list
+            self.cell_size = 2.0 * epsilon
+            self.Invalidate()
+            if item_list is not None:
+                self.Sync(item_list)
+        min_i = math.floor((given_point.x - epsilon) / self.cell_size)
+        max_i = math.floor((given_point.x + epsilon) / self.cell_size)
+        min_j = math.floor((given_point.y - epsilon) / self.cell_size)
+        max_j = math.floor((given_point.y + epsilon) / self.cell_size)
+        found = None
+        for i in range(min_i, max_i + 1):
+            for j in range(min_j, max_j + 1):
+                bucket = self.bucket_map.get((i, j))
+                if bucket is not None:
+                    for k in bucket:
+                        if (found is None or k < found) and self.Point(k).IsPoint(given_point, epsilon):
+                            found = k
+        return found